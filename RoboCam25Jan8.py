@@ -3,13 +3,21 @@ from tkinter import messagebox
 from tkinter import Toplevel
 from tkinter import filedialog
 import threading
+import queue
+import concurrent.futures
+from collections import deque
+import re
 import time
 import cv2
 from picamera2 import Picamera2
 import numpy as np
+from PIL import Image, ImageTk
 import serial
 import serial.tools.list_ports
 import os
+import logging
+
+log = logging.getLogger("robocam")
 
 # Creation Date         6 Jan 2025
 # Last Updated          8 Jan 2025
@@ -32,9 +40,15 @@ ZStackGUI
         height, interval, file naming scheme"""
 
 class GCode:
-    def __init__(self, baudrate=250000, feedrate=2000, acceleration=5, jerk=1):
+    # USB vendor IDs of common printer boards: Arduino, CH340, FTDI, Silabs CP210x, STM32
+    PRINTER_USB_VIDS = {0x2341, 0x1A86, 0x0403, 0x10C4, 0x0483}
+    # Marlin ADVANCED_OK acknowledgment: "ok [N<line>] P<planner free> B<command buffer free>"
+    _ADVANCED_OK = re.compile(rb'ok(?:\s+N\d+)?(?:\s+P(\d+))?(?:\s+B(\d+))?')
+
+    def __init__(self, baudrate=250000, feedrate=2000, acceleration=5, jerk=1, usb_vids=None):
         """Initialize the GCode class with default baudrate and G-code settings."""
         self.baud_rate = baudrate
+        self.usb_vids = set(usb_vids) if usb_vids else self.PRINTER_USB_VIDS
         self.serial_port = None
         self.printer_on_serial = None
         self.listener_thread = None
@@ -43,22 +57,28 @@ class GCode:
         self.feedrate = feedrate
         self.acceleration = acceleration
         self.jerk = jerk
-        self.waiting_for_response = False  # Add flag for response handling
-        self.last_response = None  # Add variable to store last response
+        self._response_queue = queue.Queue()  # Raw byte lines from the listener thread, consumed by send_gcode
+        self._rx_buf = bytearray()  # Partial line received from the printer
+        self.stream_window = 4  # Commands allowed in flight while streaming (Marlin BUFSIZE)
+        self._inflight = 0  # Streamed commands still waiting for their 'ok'
+        self._inflight_cond = threading.Condition()
+        self.planner_free = None  # Free planner slots from the last advanced ok (None if not reported)
+        self.cmd_buf_free = None  # Free command buffer slots, replaces stream_window once reported
+        self._sent_since_ack = 0  # Streamed commands possibly still in transit when the next ok was sent
+        self._tx_buf = bytearray()  # Streamed commands not yet written to the port
+        self.tx_flush_size = 512  # Bytes to accumulate before forcing a write
         self.connect_to_printer()
 
     def find_serial_port(self):
         """Find available serial ports and select the correct one."""
+        # Match on the USB descriptors only; opening a port toggles DTR and resets the printer board
         ports = serial.tools.list_ports.comports()
         for port in ports:
-            if 'USB' in port.description:  # Check if it's a USB serial port
-                try:
-                    # Try opening the port to verify it works
-                    ser = serial.Serial(port.device, self.baud_rate, timeout=1)
-                    ser.close()  # Close the port if it connects successfully
-                    return port.device
-                except serial.SerialException:
-                    print(f"Failed to connect on {port.device}")
+            if port.vid in self.usb_vids:
+                return port.device
+        for port in ports:
+            if 'USB' in port.description:  # Fall back to any USB serial port
+                return port.device
         return None
 
     def connect_to_printer(self):
@@ -66,104 +86,180 @@ class GCode:
         serial_port = self.find_serial_port()
         if serial_port:
             try:
-                self.printer_on_serial = serial.Serial(serial_port, self.baud_rate, timeout=1)
+                # Short timeout so the blocking read in the listener can notice a disconnect
+                self.printer_on_serial = serial.Serial(serial_port, self.baud_rate, timeout=0.05, write_timeout=None)
                 self.connected = True
-                print(f"Connected to printer on {serial_port} at {self.baud_rate} baud.")
+                log.info("Connected to printer on %s at %s baud.", serial_port, self.baud_rate)
                 
                 # Start the listener thread immediately
-                print("Debug - Starting listener thread")
+                log.debug("Starting listener thread")
                 self.listener_thread = threading.Thread(target=self.listen_to_printer_output)
                 self.listener_thread.daemon = True
                 self.listener_thread.start()
-                print("Debug - Listener thread started")
+                log.debug("Listener thread started")
                 
                 # Wait for the printer to initialize
                 time.sleep(2)
                 
                 # Initial commands
-                self.set_jerk(self.jerk)
-                self.set_acceleration(self.acceleration)
+                self.set_motion_limits(self.acceleration, self.jerk)
                 
             except serial.SerialException:
-                print("Failed to establish connection.")
+                log.error("Failed to establish connection.")
                 self.connected = False
         else:
-            print("No valid serial port found.")
+            log.error("No valid serial port found.")
             self.connected = False
     
     def listen_to_printer_output(self):
         """Listen for data coming from the printer."""
-        print("Debug - Listener thread started running")  # Debug line
+        log.debug("Listener thread started running")
+        port = self.printer_on_serial
+        data_received = self._data_received
         while self.connected:
-            if self.printer_on_serial and self.printer_on_serial.in_waiting > 0:
-                try:
-                    response = self.printer_on_serial.readline().decode('utf-8', errors='ignore').strip()
-                    print(f"Debug - Listener got raw response: '{response}'")  # Debug line
-                    if self.waiting_for_response:
-                        print(f"Debug - Storing response: '{response}'")
-                        self.last_response = response
-                    else:
-                        print(f"Debug - Printing response: '{response}'")
-                        print(f"Printer: {response}")
-                except UnicodeDecodeError as e:
-                    print(f"UnicodeDecodeError: Failed to decode data from printer: {e}")
-            time.sleep(0.01)
-        print("Debug - Listener thread exiting")  # Debug line
-
-    def send_gcode(self, command):
+            # Block for the first byte (or the port timeout), then take everything already buffered
+            try:
+                data = port.read(port.in_waiting or 1)
+            except serial.SerialException as e:
+                log.error("Serial read failed: %s", e)
+                break
+            if data:
+                data_received(data)
+        log.debug("Listener thread exiting")
+
+    def _data_received(self, data):
+        """Split raw serial bytes into newline-terminated responses."""
+        self._rx_buf += data
+        while b'\n' in self._rx_buf:
+            line, _, self._rx_buf = self._rx_buf.partition(b'\n')
+            self._handle_line(bytes(line.strip()))
+
+    def _handle_line(self, response):
+        """Route one raw printer response line to a waiting stream slot or the response queue."""
+        log.debug("Listener got raw response: %r", response)
+        if response.startswith(b'ok'):
+            with self._inflight_cond:
+                match = self._ADVANCED_OK.match(response)
+                if match.group(2) is not None:
+                    if match.group(1) is not None:
+                        self.planner_free = int(match.group(1))
+                    # Commands sent since the last ok may not have reached the buffer when B was counted
+                    self.cmd_buf_free = max(0, int(match.group(2)) - self._sent_since_ack)
+                    self._inflight_cond.notify_all()
+                self._sent_since_ack = 0
+                if self._inflight > 0:
+                    # Acknowledges a streamed command, free its slot
+                    self._inflight -= 1
+                    self._inflight_cond.notify_all()
+                    return
+        self._response_queue.put(response)
+
+    def send_gcode(self, command, timeout=None):
         """Send a G-code command and wait for acknowledgment."""
         if not self.printer_on_serial:
-            print("No printer connected.")
+            log.error("No printer connected.")
+            return False
+
+        # Let any streamed commands finish so their acks aren't mistaken for ours
+        if not self.drain():
             return False
 
         try:
-            # Clear any pending data
-            self.printer_on_serial.reset_input_buffer()
-            self.last_response = None
-            
-            # Set waiting flag before sending command
-            self.waiting_for_response = True
-            print("Debug - Set waiting_for_response to True")  # Debug output
+            # Log leftover responses; the listener owns the port, so the input buffer is never reset
+            # here (that would cut a half-received line and lose the next ok)
+            while not self._response_queue.empty():
+                log.info("Printer: %s", self._response_queue.get_nowait().decode('utf-8', errors='ignore'))
             
             # Send the command
-            print(f"Sending: {command}")
+            log.debug("Sending: %s", command)
             self.printer_on_serial.write((command + '\n').encode('utf-8'))
             
-            # Set timeout based on command
-            timeout = 30 if command.startswith('G28') else 10  # 30 seconds for homing, 10 for others
+            # Set timeout based on command unless the caller gave one
+            if timeout is None:
+                timeout = 30 if command.startswith('G28') else 10  # 30 seconds for homing, 10 for others
             
             # Wait for acknowledgment with timeout
-            start_time = time.time()
-            while time.time() - start_time < timeout:  # Use variable timeout
-                if self.last_response is not None:
-                    response = self.last_response
-                    print(f"Debug - Got response: '{response}'")  # Debug output
-                    self.last_response = None  # Clear the response
-                    
-                    # Check for acknowledgment
-                    if 'ok' in response.lower():
-                        print("Debug - Found 'ok' in response")  # Debug output
-                        self.waiting_for_response = False
-                        return True
-                    elif 'error' in response.lower():
-                        print(f"Error response from printer: {response}")
-                        self.waiting_for_response = False
-                        return False
-                time.sleep(0.01)
+            deadline = time.time() + timeout
+            while True:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                try:
+                    response = self._response_queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                # Check for acknowledgment on the raw bytes; decode only for display
+                if response.startswith(b'ok'):
+                    log.debug("Found 'ok' in response")
+                    return True
+                text = response.decode('utf-8', errors='ignore')
+                if b'error' in response.lower():
+                    log.error("Error response from printer: %s", text)
+                    return False
+                else:
+                    log.info("Printer: %s", text)
             
-            print(f"Debug - {timeout}s timeout occurred")  # Debug output
-            self.waiting_for_response = False
-            print("Command timed out - no acknowledgment received")
+            log.warning("Command timed out after %ss - no acknowledgment received", timeout)
             return False
             
         except Exception as e:
-            self.waiting_for_response = False
-            print(f"Error sending command {command}: {e}")
+            log.error("Error sending command %s: %s", command, e)
+            return False
+
+    def stream_gcode(self, commands, timeout=10):
+        """Send a sequence of G-code commands, keeping up to stream_window of them in flight."""
+        if not self.printer_on_serial:
+            log.error("No printer connected.")
             return False
 
+        for command in commands:
+            with self._inflight_cond:
+                window_full = not self._can_send()
+            if window_full:
+                # The printer can only ack what it has received, so push out the batch before waiting
+                self._flush_tx()
+            with self._inflight_cond:
+                # Wait for the printer to acknowledge an earlier command before filling its buffer further
+                if not self._inflight_cond.wait_for(self._can_send, timeout):
+                    log.warning("Streaming timed out - no acknowledgment received")
+                    return False
+                self._inflight += 1
+                self._sent_since_ack += 1
+                if self.cmd_buf_free is not None:
+                    self.cmd_buf_free = max(0, self.cmd_buf_free - 1)
+            log.debug("Sending: %s", command)
+            self._tx_buf += (command + '\n').encode('utf-8')
+            if len(self._tx_buf) >= self.tx_flush_size:
+                self._flush_tx()
+        self._flush_tx()
+        return True
+
+    def _can_send(self):
+        """Return True if the printer has room for another streamed command (call with _inflight_cond held)."""
+        if self.cmd_buf_free is None:
+            # Firmware without ADVANCED_OK: assume a fixed buffer size
+            return self._inflight < self.stream_window
+        return self.cmd_buf_free > 0 or self._inflight == 0
+
+    def _flush_tx(self):
+        """Write all batched commands to the port in a single call."""
+        if self._tx_buf:
+            self.printer_on_serial.write(bytes(self._tx_buf))
+            self._tx_buf.clear()
+
+    def drain(self, timeout=30):
+        """Wait until every streamed command has been acknowledged."""
+        with self._inflight_cond:
+            if not self._inflight_cond.wait_for(lambda: self._inflight == 0, timeout):
+                log.warning("Timed out waiting for streamed commands to finish")
+                self._inflight = 0  # Treat the missing acks as lost so later commands can go out
+                self._sent_since_ack = 0
+                return False
+        return True
+
     def wait_for_initial_response(self):
         """Wait for initial response from printer."""
-        print("Waiting for initial response from printer...")
+        log.info("Waiting for initial response from printer...")
         # Clear any existing data
         self.printer_on_serial.reset_input_buffer()
         
@@ -172,11 +268,11 @@ class GCode:
             if self.printer_on_serial.in_waiting:
                 try:
                     response = self.printer_on_serial.readline().decode('utf-8', errors='ignore').strip()
-                    print(f"Received from printer: {response}")
+                    log.info("Received from printer: %s", response)
                     
                     # Keep reading even if we get SD init fail or other messages
                     if any(word in response.lower() for word in ['ok', 'start']):
-                        print("Printer is ready, continuing...")
+                        log.info("Printer is ready, continuing...")
                         # Start the listener thread
                         self.listener_thread = threading.Thread(target=self.listen_to_printer_output)
                         self.listener_thread.daemon = True
@@ -184,11 +280,15 @@ class GCode:
                         return True
                         
                 except UnicodeDecodeError as e:
-                    print(f"Error reading from printer: {e}")
+                    log.error("Error reading from printer: %s", e)
                     continue
             time.sleep(0.1)
         return False
     
+    def wait_for_completion(self, timeout=30):
+        """Block until all queued moves have finished (M400 is acknowledged once the planner is empty)."""
+        return self.send_gcode("M400", timeout=timeout)
+
     def set_feedrate(self, feedrate):
         """Set the feedrate (speed)."""
         self.feedrate = feedrate
@@ -205,6 +305,14 @@ class GCode:
         command = f"M205 X{jerk} Y{jerk} Z{jerk}"
         self.send_gcode(command)
 
+    def set_motion_limits(self, acceleration, jerk):
+        """Set acceleration and jerk together, streamed to the printer as one batch."""
+        self.acceleration = acceleration
+        self.jerk = jerk
+        return (self.stream_gcode([f"M201 X{acceleration} Y{acceleration} Z{acceleration} E{acceleration}",
+                                   f"M205 X{jerk} Y{jerk} Z{jerk}"])
+                and self.drain())
+
     def move_xyz(self, x, y, z):
         """Move the XYZ axes to the provided coordinates, ensuring no negative values."""
         x = max(0, x)  # Prevent negative X
@@ -220,15 +328,14 @@ class GCode:
 
     def home_all_axes(self):
         """Home all axes and reset current positions to 0."""
-        if self.send_gcode("G28"):  # If homing is successful
-            print("Homing completed, positions reset to 0.")
+        # G28 and the move to 0,0,0 go out in one write; Marlin acks G28 only once homing is done,
+        # so the drain covers both the homing time and the move
+        if (self.stream_gcode(["G28", f"G1 X0 Y0 Z0 F{self.feedrate}"], timeout=30)
+                and self.drain(timeout=60)):
             self.current_position = {'X': 0, 'Y': 0, 'Z': 0}
-            
-            # Add move to 0,0,0 after successful homing
-            self.send_gcode(f"G1 X0 Y0 Z0 F{self.feedrate}")
-            print("Moved to home position (0,0,0).")
+            log.info("Homing completed, moved to home position (0,0,0).")
         else:
-            print("Homing failed or timed out.")
+            log.error("Homing failed or timed out.")
 
     def enable_steppers(self):
         """Enable steppers."""
@@ -241,33 +348,20 @@ class GCode:
     def close_connection(self):
         """Close the serial connection and stop the listener thread."""
         if self.printer_on_serial:
-            print("Closing serial connection...")
+            log.info("Closing serial connection...")
             self.connected = False
+            # The listener's read returns within the port timeout once it sees connected is False
+            if self.listener_thread:
+                self.listener_thread.join(timeout=1)
+            self.printer_on_serial.close()
+            self.printer_on_serial = None
             
-class Camera:
-    def __init__(self):
-        self.capture = cv2.VideoCapture(0)  # Initialize the camera (0 is usually the default camera)
-
-        if not self.capture.isOpened():
-            raise Exception("Could not open video device")
-
-    def get_frame(self):
-        """Get a frame from the camera."""
-        ret, frame = self.capture.read()  # Capture frame from the camera
-        if not ret:
-            raise Exception("Failed to grab frame")
-        return frame
-
-    def release(self):
-        """Release the camera when done."""
-        self.capture.release()
-
-
 class GCodeGUI:
     def __init__(self, root, gcode):
         """Initialize the GUI class."""
         self.root = root
         self.gcode = gcode
+        self._entry_dirty = False  # A coordinate entry refresh is already scheduled
         
         self.root.title("GCode Control")
 
@@ -279,23 +373,23 @@ class GCodeGUI:
         self.x_label = tk.Label(self.frame, text="X:")
         self.x_label.grid(row=0, column=0, padx=5, pady=5)
 
-        self.x_entry = tk.Entry(self.frame)
+        self.x_var = tk.StringVar(value=str(self.gcode.current_position['X']))  # Default value
+        self.x_entry = tk.Entry(self.frame, textvariable=self.x_var)
         self.x_entry.grid(row=0, column=1, padx=5, pady=5)
-        self.x_entry.insert(0, str(self.gcode.current_position['X']))  # Default value
 
         self.y_label = tk.Label(self.frame, text="Y:")
         self.y_label.grid(row=1, column=0, padx=5, pady=5)
 
-        self.y_entry = tk.Entry(self.frame)
+        self.y_var = tk.StringVar(value=str(self.gcode.current_position['Y']))  # Default value
+        self.y_entry = tk.Entry(self.frame, textvariable=self.y_var)
         self.y_entry.grid(row=1, column=1, padx=5, pady=5)
-        self.y_entry.insert(0, str(self.gcode.current_position['Y']))  # Default value
 
         self.z_label = tk.Label(self.frame, text="Z:")
         self.z_label.grid(row=2, column=0, padx=5, pady=5)
 
-        self.z_entry = tk.Entry(self.frame)
+        self.z_var = tk.StringVar(value=str(self.gcode.current_position['Z']))  # Default value
+        self.z_entry = tk.Entry(self.frame, textvariable=self.z_var)
         self.z_entry.grid(row=2, column=1, padx=5, pady=5)
-        self.z_entry.insert(0, str(self.gcode.current_position['Z']))  # Default value
 
         # Send Absolute Button
         self.send_button = tk.Button(self.frame, text="Send Absolute Coordinates", command=self.send_to_printer)
@@ -376,41 +470,39 @@ class GCodeGUI:
 
     def move_increment(self, axis, direction):
         """Increment or decrement the specified axis by the given amount."""
-        step_size = self.step_size.get()  # Get the currently selected step size from the radio buttons
-        increment = step_size * direction  # Apply the direction (positive or negative)
+        position = self.gcode.current_position
+        increment = self.step_size.get() * direction  # Apply the direction (positive or negative)
 
         # Calculate the new position, ensuring it's non-negative
-        new_position = self.gcode.current_position[axis] + increment
-        new_position = max(0, new_position)  # Prevent negative positions
-
-        # Move the axis
-        if axis == 'X':
-            self.gcode.move_xyz(new_position, self.gcode.current_position['Y'], self.gcode.current_position['Z'])
-        elif axis == 'Y':
-            self.gcode.move_xyz(self.gcode.current_position['X'], new_position, self.gcode.current_position['Z'])
-        elif axis == 'Z':
-            self.gcode.move_xyz(self.gcode.current_position['X'], self.gcode.current_position['Y'], new_position)
-
-        # After movement, update the entry fields with the new position
-        self.x_entry.delete(0, tk.END)
-        self.x_entry.insert(0, str(self.gcode.current_position['X']))
-
-        self.y_entry.delete(0, tk.END)
-        self.y_entry.insert(0, str(self.gcode.current_position['Y']))
-
-        self.z_entry.delete(0, tk.END)
-        self.z_entry.insert(0, str(self.gcode.current_position['Z']))
+        target = {'X': position['X'], 'Y': position['Y'], 'Z': position['Z']}
+        target[axis] = max(0, target[axis] + increment)  # Prevent negative positions
+
+        # Move the axis, then update the entry fields with the new position
+        self.gcode.move_xyz(target['X'], target['Y'], target['Z'])
+        self._schedule_entry_sync()
+
+    def _sync_entries(self, position):
+        """Write an X/Y/Z position dict into the coordinate entries (one Tk call per field)."""
+        self.x_var.set(str(position['X']))
+        self.y_var.set(str(position['Y']))
+        self.z_var.set(str(position['Z']))
+
+    def _schedule_entry_sync(self):
+        """Refresh the entries from the printer position once Tk is idle, coalescing rapid jogs."""
+        if not self._entry_dirty:
+            self._entry_dirty = True
+            self.root.after_idle(self._refresh_entries_once)
+
+    def _refresh_entries_once(self):
+        """Idle callback for _schedule_entry_sync."""
+        self._entry_dirty = False
+        self._sync_entries(self.gcode.current_position)
 
     def home_axes(self):
         """Send home command to printer."""
         self.gcode.home_all_axes()
         # Reset the XYZ entries to 0 after homing
-        self.x_entry.delete(0, tk.END)
-        self.y_entry.delete(0, tk.END)
-        self.z_entry.delete(0, tk.END)
-        self.x_entry.insert(0, "0")
-        self.y_entry.insert(0, "0")
-        self.z_entry.insert(0, "0")
+        self._sync_entries({'X': 0, 'Y': 0, 'Z': 0})
 
     def send_to_printer(self):
         """Send the absolute coordinates to the printer."""
@@ -419,6 +511,7 @@ class GCodeGUI:
             y = float(self.y_entry.get())
             z = float(self.z_entry.get())
             self.gcode.move_xyz(x, y, z)
+            self._schedule_entry_sync()
         except ValueError:
             print("Invalid coordinates!")
 
@@ -437,8 +530,7 @@ class GCodeGUI:
             acceleration = float(self.acceleration_entry.get())
             jerk = float(self.jerk_entry.get())
             self.gcode.set_feedrate(feedrate)
-            self.gcode.set_acceleration(acceleration)
-            self.gcode.set_jerk(jerk)
+            self.gcode.set_motion_limits(acceleration, jerk)
         except ValueError:
             print("Invalid values for settings!")
 
@@ -450,6 +542,15 @@ class GCodeGUI:
         #self.root.quit()  # Exit the Tkinter main loop
 
 class CameraGUI:
+    # Overlay color names to RGB tuples (frames arrive from the camera in RGB order)
+    _COLOR_MAP = {
+        "blue": (0, 0, 255),
+        "green": (0, 255, 0),
+        "red": (255, 0, 0),
+        "yellow": (255, 255, 0),
+        "white": (255, 255, 255)
+    }
+
     def __init__(self, root):
         self.root = root
         self.root.title("Camera Preview")
@@ -471,6 +572,11 @@ class CameraGUI:
         self.overlay_color = tk.StringVar(value="red")
         self.overlay_size = tk.IntVar(value=100)
         self.overlay_thickness = tk.IntVar(value=2)
+        self.preview_size = (640, 480)  # Width x Height of the camera stream
+        self._center = (self.preview_size[0] // 2, self.preview_size[1] // 2)
+        # Run the warp through OpenCV's OpenCL path when the platform provides one
+        self._use_opencl = cv2.ocl.haveOpenCL()
+        cv2.ocl.setUseOpenCL(self._use_opencl)
         
         # Create preview label with fixed size
         self.image_label = tk.Label(self.preview_frame, width=640, height=480)
@@ -480,9 +586,17 @@ class CameraGUI:
         self.create_camera_controls()
         self.create_overlay_controls()
         
+        # Keep plain Python copies of the settings so the per-frame path makes no Tcl calls
+        self._cached = {}
+        for var in (self.rotation, self.zoom, self.overlay_color, self.overlay_size,
+                    self.overlay_thickness, self.crosshair_enabled, self.circle_enabled):
+            var.trace_add('write', self._refresh_cache)
+        self._refresh_cache()
+        
         # Initialize camera and start preview
         self.picam2 = None
         self.running = False
+        self._capture_thread = None
         self.start_camera_preview()
         
         # Bind window closing event
@@ -542,61 +656,72 @@ class CameraGUI:
         thickness_scale.pack(fill=tk.X)
 
         
-    def draw_overlay(self, frame):
-        """Draw overlay on the frame"""
-        height, width = frame.shape[:2]
-        center_x = width // 2
-        center_y = height // 2
-
-        # Validate circle size input
+    def _refresh_cache(self, *args):
+        """Copy the current Tk settings into self._cached (called on every variable write)."""
         try:
             size = int(self.overlay_size.get())
-        except ValueError:
+        except (ValueError, tk.TclError):
             size = 100  # Default size if invalid input
-
-        thickness = self.overlay_thickness.get()
-        
-        # Convert color name to BGR
-        color_map = {
-            "blue": (0, 0, 255),
-            "green": (0, 255, 0),
-            "red": (255, 0, 0),
-            "yellow": (255, 255, 0),
-            "white": (255, 255, 255)
+        try:
+            thickness = int(self.overlay_thickness.get())
+        except (ValueError, tk.TclError):
+            thickness = 2
+        try:
+            zoom = float(self.zoom.get())
+        except (ValueError, tk.TclError):
+            zoom = 1.0
+        rotation = self.rotation.get()
+        cached = {
+            'color': self._COLOR_MAP[self.overlay_color.get()],
+            'size': size,
+            'thk': thickness,
+            'cross': self.crosshair_enabled.get(),
+            'circ': self.circle_enabled.get(),
+            'rot': rotation,
+            'zoom': zoom
         }
-        color = color_map[self.overlay_color.get()]
+        # Rotation and zoom only change on user input, so build the affine matrix here rather than per frame
+        if rotation != 0 or zoom != 1.0:
+            width, height = self.preview_size
+            cached['matrix'] = cv2.getRotationMatrix2D((width/2, height/2), rotation, zoom)
+        else:
+            cached['matrix'] = None
+        # Publish the finished dict in one assignment; the capture thread may read it at any moment
+        self._cached = cached
+        # In the default state (no rotation, no zoom, no overlays) frames go straight from capture to display
+        self._needs_processing = (rotation != 0 or zoom != 1.0
+                                  or cached['cross'] or cached['circ'])
         
-        if self.crosshair_enabled.get():
+    def draw_overlay(self, frame):
+        """Draw overlay on the frame"""
+        width, height = self.preview_size
+        center_x, center_y = self._center
+        cached = self._cached
+        color = cached['color']
+        thickness = cached['thk']
+        
+        if cached['cross']:
             # Draw crosshair to maximum size
             cv2.line(frame, (0, center_y), (width, center_y), color, thickness)  # Horizontal line
             cv2.line(frame, (center_x, 0), (center_x, height), color, thickness)  # Vertical line
                 
-        if self.circle_enabled.get():
+        if cached['circ']:
             # Draw circle
-            cv2.circle(frame, (center_x, center_y), size // 2, color, thickness)
+            cv2.circle(frame, (center_x, center_y), cached['size'] // 2, color, thickness)
             
         return frame
 
-
-
-
     def apply_transformations(self, frame):
         """Apply rotation and zoom to frame"""
-        # Apply rotation
-        if self.rotation.get() != 0:
-            rows, cols = frame.shape[:2]
-            matrix = cv2.getRotationMatrix2D((cols/2, rows/2), self.rotation.get(), 1)
-            frame = cv2.warpAffine(frame, matrix, (cols, rows))
+        matrix = self._cached['matrix']
         
-        # Apply zoom
-        if self.zoom.get() != 1.0:
-            rows, cols = frame.shape[:2]
-            zoom = self.zoom.get()
-            crop_size = (int(cols/zoom), int(rows/zoom))
-            x = (cols - crop_size[0]) // 2
-            y = (rows - crop_size[1]) // 2
-            frame = frame[y:y+crop_size[1], x:x+crop_size[0]]
-            frame = cv2.resize(frame, (cols, rows))
+        # Rotation and zoom about the center in one warp (no separate crop + resize pass)
+        if matrix is not None:
+            if self._use_opencl:
+                # Overlays are drawn on the numpy array afterwards, so bring the result back with get()
+                frame = cv2.warpAffine(cv2.UMat(frame), matrix, self.preview_size, flags=cv2.INTER_LINEAR).get()
+            else:
+                frame = cv2.warpAffine(frame, matrix, self.preview_size, flags=cv2.INTER_LINEAR)
             
         return frame
 
@@ -606,59 +731,97 @@ class CameraGUI:
             try:
                 # Initialize Picamera2 and configure it
                 self.picam2 = Picamera2()
-                picam2_config = self.picam2.create_preview_configuration(main={"size": (640, 480)})
+                # Picamera2 names formats by little-endian word order: "BGR888" arrays are [R, G, B] per pixel,
+                # which is what Tk/PIL want, so frames need no color conversion
+                picam2_config = self.picam2.create_preview_configuration(
+                    main={"size": self.preview_size, "format": "BGR888"})
                 self.picam2.configure(picam2_config)
                 self.picam2.start()
                 self.running = True
-                print("Camera started.")
+                log.info("Camera started.")
+                # One persistent Tk image; each frame is pasted into it instead of allocating a new one
+                self._tk_img = ImageTk.PhotoImage(Image.new('RGB', self.preview_size))
+                self.image_label.configure(image=self._tk_img)
+                # Capture and processing run on a worker thread; the Tk side only uploads finished frames
+                self._frame_queue = queue.Queue(maxsize=2)
+                self._capture_thread = threading.Thread(target=self._capture_loop, daemon=True)
+                self._capture_thread.start()
                 self.update_frame()
             except Exception as e:
-                print(f"Error starting camera: {e}")
+                log.error("Error starting camera: %s", e)
                 if self.picam2:
                     self.picam2.close()
                     self.picam2 = None
                 self.running = False
 
-    def update_frame(self):
-        """Update the image on the label."""
-        if self.running and self.picam2:
+    def _capture_loop(self):
+        """Capture, transform and annotate frames off the Tk thread."""
+        # Bind the per-frame callables once so the loop body avoids repeated attribute lookups
+        capture_request = self.picam2.capture_request
+        transform = self.apply_transformations
+        overlay = self.draw_overlay
+        put = self._frame_queue.put_nowait
+        drop = self._frame_queue.get_nowait
+        while self.running:
             try:
-                # Capture frame
-                frame = self.picam2.capture_array("main")
-                
-                # Apply transformations
-                frame = self.apply_transformations(frame)
-                
-                # Draw overlay
-                frame = self.draw_overlay(frame)
-                
-                # Convert to RGB for tkinter
-                frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                
-                # Convert to PhotoImage
-                photo = tk.PhotoImage(data=cv2.imencode('.ppm', frame)[1].tobytes())
-                
-                # Update the preview label
-                self.image_label.configure(image=photo)
-                self.image_label.image = photo
-                
-                # Schedule next update
-                self.root.after(10, self.update_frame)
+                # make_array already copies out of the request's buffer, so the array is ours to keep
+                # (and to draw on); hand the buffer back to libcamera before doing any processing
+                request = capture_request()
+                try:
+                    frame = request.make_array("main")
+                finally:
+                    request.release()
+                if self._needs_processing:
+                    frame = overlay(transform(frame))
             except Exception as e:
-                print(f"Error updating frame: {e}")
+                log.error("Error capturing frame: %s", e)
                 self.running = False
+                break
+            try:
+                put(frame)
+            except queue.Full:
+                # Tk is behind; drop the oldest frame so the preview always shows the latest one
+                try:
+                    drop()
+                except queue.Empty:
+                    pass
+                put(frame)
+
+    def update_frame(self):
+        """Update the image on the label."""
+        if not self.running:
+            return
+        try:
+            frame = self._frame_queue.get_nowait()
+        except queue.Empty:
+            frame = None
+        try:
+            if frame is not None:
+                # Paste straight from the pixel buffer; the label already shows this image
+                self._tk_img.paste(Image.fromarray(frame))
+        except Exception as e:
+            log.error("Error updating frame: %s", e)
+            self.running = False
+        finally:
+            # Schedule next update
+            if self.running:
+                self.root.after(16, self.update_frame)
 
     def stop(self):
         """Stop the camera when closing the GUI."""
         self.running = False
+        # Let the capture thread finish its current frame before the camera goes away
+        if self._capture_thread:
+            self._capture_thread.join(timeout=1)
+            self._capture_thread = None
         if self.picam2 is not None:
             try:
                 self.picam2.stop()
                 self.picam2.close()
                 self.picam2 = None
-                print("Camera stopped and closed.")
+                log.info("Camera stopped and closed.")
             except Exception as e:
-                print(f"Error stopping camera: {e}")
+                log.error("Error stopping camera: %s", e)
 
     def on_closing(self):
         """Handle window closing event."""
@@ -733,6 +896,7 @@ class ExperimentGUI:
         self.save_folder = ""
         self.is_running = False
         self.file_prefix = "fileprefix"
+        self._folder_results = queue.Queue()  # (folder, writable) from the folder check thread
         
 
     def init_gui(self):
@@ -809,10 +973,38 @@ class ExperimentGUI:
             self.init_gui()
 
     def select_folder(self):
-        folder = filedialog.askdirectory()
+        # Tk dialogs must stay on the Tk thread; its nested event loop keeps servicing the preview meanwhile
+        folder = filedialog.askdirectory(parent=self.window)
         if folder:
-            self.save_folder = folder
-            self.folder_path.set(folder)
+            # Checking the folder can stall on slow network shares, so do it off the Tk thread
+            self.status_var.set("Checking folder...")
+            threading.Thread(target=self._check_folder, args=(folder,), daemon=True).start()
+            self._poll_folder_check()
+
+    def _check_folder(self, folder):
+        """Worker thread: probe the folder and queue the result; no Tk calls here."""
+        writable = os.path.isdir(folder) and os.access(folder, os.W_OK)
+        self._folder_results.put((folder, writable))
+
+    def _poll_folder_check(self):
+        """Tk thread: apply the folder check result once the worker has queued it."""
+        if self.window is None:
+            return  # Window closed while checking
+        try:
+            folder, writable = self._folder_results.get_nowait()
+        except queue.Empty:
+            self.window.after(50, self._poll_folder_check)
+            return
+        self._apply_folder(folder, writable)
+
+    def _apply_folder(self, folder, writable):
+        """Tk thread: apply the selected folder."""
+        self.status_var.set("Ready")
+        if not writable:
+            messagebox.showerror("Error", f"Cannot write to {folder}")
+            return
+        self.save_folder = folder
+        self.folder_path.set(folder)
 
     def start_experiment(self):
         if not self.save_folder:
@@ -857,6 +1049,9 @@ class ExperimentGUI:
             self.checkbox_var.set(False)
             
 class PathfinderGUI:
+    NUM_ROWS = 6  # A to F
+    NUM_COLS = 8  # 1 to 8
+
     def __init__(self, root, gcode):
         self.root = root
         self.gcode = gcode
@@ -870,6 +1065,7 @@ class PathfinderGUI:
         self.A8 = None
         self.F8 = None
         self.F1 = None
+        self.path = None  # (NUM_ROWS * NUM_COLS, 3) array of X, Y, Z in A1, A2 ... F8 order
         
         # Create main frame
         self.main_frame = tk.Frame(self.root)
@@ -882,61 +1078,27 @@ class PathfinderGUI:
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
         
     def create_widgets(self):
-        # Capture A1 Well button
-        self.A1_frame = tk.Frame(self.main_frame)
-        self.A1_frame.pack(anchor=tk.W, padx=5, pady=5)
-        self.A1_button = tk.Button(self.A1_frame, text="Capture A1 Well", command=self.capture_A1)
-        self.A1_button.pack(side=tk.LEFT)
-        self.A1_label = tk.Label(self.A1_frame, text="")
-        self.A1_label.pack(side=tk.LEFT, padx=5)
-        
-        # Capture A8 Well button
-        self.A8_frame = tk.Frame(self.main_frame)
-        self.A8_frame.pack(anchor=tk.W, padx=5, pady=5)
-        self.A8_button = tk.Button(self.A8_frame, text="Capture A8 Well", command=self.capture_A8)
-        self.A8_button.pack(side=tk.LEFT)
-        self.A8_label = tk.Label(self.A8_frame, text="")
-        self.A8_label.pack(side=tk.LEFT, padx=5)
-        
-        # Capture F8 Well button
-        self.F8_frame = tk.Frame(self.main_frame)
-        self.F8_frame.pack(anchor=tk.W, padx=5, pady=5)
-        self.F8_button = tk.Button(self.F8_frame, text="Capture F8 Well", command=self.capture_F8)
-        self.F8_button.pack(side=tk.LEFT)
-        self.F8_label = tk.Label(self.F8_frame, text="")
-        self.F8_label.pack(side=tk.LEFT, padx=5)
-        
-        # Capture F1 Well button
-        self.F1_frame = tk.Frame(self.main_frame)
-        self.F1_frame.pack(anchor=tk.W, padx=5, pady=5)
-        self.F1_button = tk.Button(self.F1_frame, text="Capture F1 Well", command=self.capture_F1)
-        self.F1_button.pack(side=tk.LEFT)
-        self.F1_label = tk.Label(self.F1_frame, text="")
-        self.F1_label.pack(side=tk.LEFT, padx=5)
+        # Capture buttons for the four corner wells
+        for name in ('A1', 'A8', 'F8', 'F1'):
+            frame = tk.Frame(self.main_frame)
+            frame.pack(anchor=tk.W, padx=5, pady=5)
+            button = tk.Button(frame, text=f"Capture {name} Well", command=lambda n=name: self.capture_well(n))
+            button.pack(side=tk.LEFT)
+            label = tk.Label(frame, text="")
+            label.pack(side=tk.LEFT, padx=5)
+            setattr(self, f"{name}_frame", frame)
+            setattr(self, f"{name}_button", button)
+            setattr(self, f"{name}_label", label)
         
         # Generate Path button
         self.generate_button = tk.Button(self.main_frame, text="Generate Path", command=self.generate_path, state=tk.DISABLED)
         self.generate_button.pack(pady=10)
         
-    def capture_A1(self):
-        self.A1 = {'X': self.gcode.current_position['X'], 'Y': self.gcode.current_position['Y'], 'Z': self.gcode.current_position['Z']}
-        self.A1_label.config(text=f"X: {self.A1['X']:.2f}, Y: {self.A1['Y']:.2f}, Z: {self.A1['Z']:.2f}")
-        self.check_capture_status()
-
-    def capture_A8(self):
-        self.A8 = {'X': self.gcode.current_position['X'], 'Y': self.gcode.current_position['Y'], 'Z': self.gcode.current_position['Z']}
-        self.A8_label.config(text=f"X: {self.A8['X']:.2f}, Y: {self.A8['Y']:.2f}, Z: {self.A8['Z']:.2f}")
-        self.check_capture_status()
-
-    def capture_F8(self):
-        self.F8 = {'X': self.gcode.current_position['X'], 'Y': self.gcode.current_position['Y'], 'Z': self.gcode.current_position['Z']}
-        self.F8_label.config(text=f"X: {self.F8['X']:.2f}, Y: {self.F8['Y']:.2f}, Z: {self.F8['Z']:.2f}")
-        self.check_capture_status()
-
-    def capture_F1(self):
-        self.F1 = {'X': self.gcode.current_position['X'], 'Y': self.gcode.current_position['Y'], 'Z': self.gcode.current_position['Z']}
-        self.F1_label.config(text=f"X: {self.F1['X']:.2f}, Y: {self.F1['Y']:.2f}, Z: {self.F1['Z']:.2f}")
-        self.check_capture_status()
+    def capture_well(self, name):
+        """Store the current position as the given corner well (A1, A8, F8 or F1)."""
+        pos = self.gcode.current_position
+        setattr(self, name, {'X': pos['X'], 'Y': pos['Y'], 'Z': pos['Z']})
+        getattr(self, f"{name}_label").config(text=f"X: {pos['X']:.2f}, Y: {pos['Y']:.2f}, Z: {pos['Z']:.2f}")
         self.check_capture_status()
         
     def check_capture_status(self):
@@ -944,8 +1106,7 @@ class PathfinderGUI:
             self.generate_button.config(state=tk.NORMAL)
         
     def generate_path(self):
-        # Generate the list of points for A1, A2, A3, ... F6, F7, F8
-        path = []
+        # Generate the points for A1, A2, A3, ... F6, F7, F8
 
         # Check if all well coordinates are captured
         if not all([self.A1, self.A8, self.F8, self.F1]):
@@ -960,30 +1121,15 @@ class PathfinderGUI:
         print(f"F8: X: {self.F8['X']:.2f}, Y: {self.F8['Y']:.2f}, Z: {self.F8['Z']:.2f}")
         print(f"F1: X: {self.F1['X']:.2f}, Y: {self.F1['Y']:.2f}, Z: {self.F1['Z']:.2f}")
 
-        # Calculate the number of rows and columns
-        num_rows = 6  # A to F
-        num_cols = 8  # 1 to 8
-
-        # Calculate the step sizes for X and Y coordinates
-        x_step = (self.A8['X'] - self.A1['X']) / (num_cols - 1)
-        y_step = (self.F1['Y'] - self.A1['Y']) / (num_rows - 1)
-
-        # Iterate over each row (A to F)
-        for row in range(num_rows):
-            # Calculate the Y coordinate for the current row
-            y = self.A1['Y'] + row * y_step
-
-            # Iterate over each column (1 to 8)
-            for col in range(num_cols):
-                # Calculate the X coordinate for the current column
-                x = self.A1['X'] + col * x_step
-
-                # Append the interpolated point to the path
-                path.append({'X': x, 'Y': y, 'Z': self.A1['Z']})
+        # Interpolate columns between A1 and A8 and rows between A1 and F1 in one grid
+        xs = np.linspace(self.A1['X'], self.A8['X'], self.NUM_COLS)
+        ys = np.linspace(self.A1['Y'], self.F1['Y'], self.NUM_ROWS)
+        grid_x, grid_y = np.meshgrid(xs, ys)  # Row-major, so ravel() gives A1..A8, B1..B8, ...
+        self.path = np.column_stack([grid_x.ravel(), grid_y.ravel(), np.full(grid_x.size, self.A1['Z'])])
 
         print("Generated path:")
-        for point in path:
-            print(f"X: {point['X']:.2f}, Y: {point['Y']:.2f}, Z: {point['Z']:.2f}")
+        for x, y, z in self.path:
+            print(f"X: {x:.2f}, Y: {y:.2f}, Z: {z:.2f}")
             
     class Experiment:
         def __init__(self, camera, gcode, path, save_folder, file_prefix):
@@ -994,38 +1140,60 @@ class PathfinderGUI:
             self.file_prefix = file_prefix
             self.is_running = False
             self.current_iteration = 1
+            self._thread = None
+            # Images are written in the background while the stage moves to the next well
+            self._io_pool = None  # Created by run_experiment, shut down when the run ends
+            self._pending_writes = deque()
+            self.max_pending_writes = 4  # Frames allowed to wait for the disk before the run blocks
 
         def start(self):
+            """Run the experiment on a worker thread so the Tk loop and camera preview keep going."""
             self.is_running = True
-            self.run_experiment()
+            self._thread = threading.Thread(target=self.run_experiment, daemon=True)
+            self._thread.start()
 
         def stop(self):
+            """Stop after the current well; the worker never sleeps, so it notices right away."""
             self.is_running = False
 
         def run_experiment(self):
-            while self.is_running:
-                for point in self.path:
-                    if not self.is_running:
-                        break
+            # A pool per run, shut down when the run ends so its threads never outlive it
+            self._io_pool = concurrent.futures.ThreadPoolExecutor(max_workers=2)
+            try:
+                while self.is_running:
+                    for index, (x, y, z) in enumerate(self.path):
+                        if not self.is_running:
+                            break
+
+                        # Move to the specified point
+                        self.gcode.move_xyz(x, y, z)
 
-                    # Move to the specified point
-                    self.gcode.move_xyz(point['X'], point['Y'], point['Z'])
+                        # Wait for the movement to complete
+                        if not self.gcode.wait_for_completion():
+                            self.is_running = False
+                            break
 
-                    # Wait for the movement to complete
-                    while self.gcode.is_moving():
-                        time.sleep(0.1)
+                        # Capture an image with the camera
+                        image = self.camera.capture_image()
 
-                    # Capture an image with the camera
-                    image = self.camera.capture_image()
+                        # Generate the file name
+                        row, col = divmod(index, PathfinderGUI.NUM_COLS)
+                        file_name = f"{self.file_prefix}_Well_{chr(ord('A') + row)}{col + 1}_{self.current_iteration}.jpg"
+                        file_path = os.path.join(self.save_folder, file_name)
 
-                    # Generate the file name
-                    file_name = f"{self.file_prefix}_Well_{point['Well']}_{self.current_iteration}.jpg"
-                    file_path = os.path.join(self.save_folder, file_name)
+                        # Save the image without holding up the next move
+                        self._pending_writes.append(self._io_pool.submit(cv2.imwrite, file_path, image))
+                        if len(self._pending_writes) > self.max_pending_writes:
+                            self._pending_writes.popleft().result()  # Back off when the disk falls behind
 
-                    # Save the image
-                    cv2.imwrite(file_path, image)
+                    self.current_iteration += 1
 
-                self.current_iteration += 1
+                # Make sure every captured image is on disk before the run is considered finished
+                while self._pending_writes:
+                    self._pending_writes.popleft().result()
+            finally:
+                self._pending_writes.clear()
+                self._io_pool.shutdown(wait=True)
 
 class App:
     def __init__(self, root):
@@ -1095,6 +1263,8 @@ class App:
 
 # Main program
 if __name__ == "__main__":
+    # Debug output (per-command and per-response) stays off unless the level is lowered here
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
     root = tk.Tk()
     app = App(root)  # Initialize the App object
     app.start()  # Start the application
@@ -1,12 +1,27 @@
 import tkinter as tk
+from tkinter import messagebox
+import queue
+import threading
+import time
 import cv2
+import numpy as np
+from PIL import Image, ImageTk
+from config.settings import CAMERA_SETTINGS, OVERLAY_COLORS
 from hardware.camera import PiCamera
 
 class CameraGUI:
+    # Rotation choices to cv2.rotate codes; like the old warpAffine, angles are counterclockwise
+    _ROTATE_CODES = {
+        90: cv2.ROTATE_90_COUNTERCLOCKWISE,
+        180: cv2.ROTATE_180,
+        270: cv2.ROTATE_90_CLOCKWISE,
+    }
+
     def __init__(self, root):
         self.root = root
         self.root.title("Camera Preview")
         self.root.geometry("1000x600")
+        self.frame_interval = 1.0 / CAMERA_SETTINGS['framerate']  # Seconds between preview frames
         
         self.setup_gui()
         self.initialize_camera()
@@ -30,6 +45,12 @@ class CameraGUI:
         self.overlay_size = tk.IntVar(value=100)
         self.overlay_thickness = tk.IntVar(value=2)
         
+        # Mirror the settings into plain attributes so the per-frame path makes no Tcl calls
+        for var in (self.rotation, self.zoom, self.crosshair_enabled, self.circle_enabled,
+                    self.overlay_color, self.overlay_size, self.overlay_thickness):
+            var.trace_add('write', self._refresh_settings)
+        self._refresh_settings()
+        
         # Create preview label
         self.image_label = tk.Label(self.preview_frame, width=640, height=480)
         self.image_label.pack(expand=True)
@@ -80,71 +101,161 @@ class CameraGUI:
                 variable=self.overlay_thickness).pack(fill=tk.X)
 
     def initialize_camera(self):
-        self.camera = PiCamera()
-        if self.camera.initialize():
-            self.running = True
+        self._frame_handler = False  # True while Tk is watching the camera's frame-ready fd
+        self._closed = False
+        self._init_lock = threading.Lock()  # Orders the init worker's hand-off against stop()
+        self._init_result = queue.Queue()  # (camera, ok) from the init worker
+        self.camera = None
+        self.running = False
+        # Camera start-up can take over a second on the Pi; keep it off the Tk thread
+        threading.Thread(target=self._init_worker, daemon=True).start()
+        self._poll_camera_ready()
+
+    def _init_worker(self):
+        # Worker thread: no Tk calls at all; the result goes through a queue the Tk thread polls
+        camera = PiCamera()
+        ok = camera.initialize()
+        with self._init_lock:
+            if self._closed:
+                camera.stop()  # Window was closed while the camera was starting
+                return
+            self._init_result.put((camera, ok))
+
+    def _poll_camera_ready(self):
+        if self._closed:
+            return
+        try:
+            camera, ok = self._init_result.get_nowait()
+        except queue.Empty:
+            self.root.after(50, self._poll_camera_ready)
+            return
+        self._on_camera_ready(camera, ok)
+
+    def _on_camera_ready(self, camera, ok):
+        if not ok:
+            messagebox.showerror("Error", "Failed to initialize camera")
+            return
+        self.camera = camera
+        # One persistent Tk image; frames are pasted into it instead of PPM-encoded into a new one
+        self._photo = ImageTk.PhotoImage(Image.new('RGB', (640, 480)))
+        self._buffers = {}  # Reused per-stage output arrays, see _buffer()
+        self.image_label.configure(image=self._photo)
+        self.running = True
+        try:
+            # Wake Tk only when the camera has delivered a frame
+            self.root.tk.createfilehandler(self.camera.fileno(), tk.READABLE, self._on_frame_ready)
+            self._frame_handler = True
+        except (AttributeError, tk.TclError):
+            # No file handlers on this platform (e.g. Windows): poll on a timer instead
+            self._frame_handler = False
             self.update_frame()
-        else:
-            self.running = False
-            tk.messagebox.showerror("Error", "Failed to initialize camera")
+
+    def _refresh_settings(self, *args):
+        self._rotation = self.rotation.get()
+        self._crosshair = self.crosshair_enabled.get()
+        self._circle = self.circle_enabled.get()
+        self._cached_color = getattr(OVERLAY_COLORS, self.overlay_color.get())
+        try:
+            self._zoom = self.zoom.get()
+            self._cached_thickness = self.overlay_thickness.get()
+            self._cached_radius = self.overlay_size.get() // 2
+        except tk.TclError:
+            pass  # Keep the last valid values while a scale is mid-edit
 
     def draw_overlay(self, frame):
+        crosshair = self._crosshair
+        circle = self._circle
+        if not (crosshair or circle):
+            return frame
+        
         height, width = frame.shape[:2]
         center_x = width // 2
         center_y = height // 2
+        color = self._cached_color
+        thickness = self._cached_thickness
         
-        color_map = {
-            "red": (0, 0, 255),
-            "green": (0, 255, 0),
-            "blue": (255, 0, 0),
-            "yellow": (0, 255, 255),
-            "white": (255, 255, 255)
-        }
-        color = color_map[self.overlay_color.get()]
-        thickness = self.overlay_thickness.get()
-        
-        if self.crosshair_enabled.get():
+        if crosshair:
             cv2.line(frame, (0, center_y), (width, center_y), color, thickness)
             cv2.line(frame, (center_x, 0), (center_x, height), color, thickness)
         
-        if self.circle_enabled.get():
-            radius = self.overlay_size.get() // 2
-            cv2.circle(frame, (center_x, center_y), radius, color, thickness)
+        if circle:
+            cv2.circle(frame, (center_x, center_y), self._cached_radius, color, thickness)
         
         return frame
 
+    def _buffer(self, name, shape):
+        """Return a persistent uint8 array for one pipeline stage, reallocated only when its shape changes."""
+        buf = self._buffers.get(name)
+        if buf is None or buf.shape != shape:
+            buf = self._buffers[name] = np.empty(shape, np.uint8)
+        return buf
+
     def apply_transformations(self, frame):
-        if self.rotation.get() != 0:
+        rotate_code = self._ROTATE_CODES.get(self._rotation)
+        if rotate_code is not None:
+            # Plain pixel shuffle, no interpolation; 90/270 swap the frame's width and height
             rows, cols = frame.shape[:2]
-            matrix = cv2.getRotationMatrix2D((cols/2, rows/2), self.rotation.get(), 1)
-            frame = cv2.warpAffine(frame, matrix, (cols, rows))
+            if rotate_code != cv2.ROTATE_180:
+                rows, cols = cols, rows
+            frame = cv2.rotate(frame, rotate_code, dst=self._buffer('rotate', (rows, cols) + frame.shape[2:]))
         
-        if self.zoom.get() != 1.0:
+        zoom = self._zoom
+        if zoom != 1.0:
+            # Scale about the center in one warp instead of crop + resize
             rows, cols = frame.shape[:2]
-            zoom = self.zoom.get()
-            crop_size = (int(cols/zoom), int(rows/zoom))
-            x = (cols - crop_size[0]) // 2
-            y = (rows - crop_size[1]) // 2
-            frame = frame[y:y+crop_size[1], x:x+crop_size[0]]
-            frame = cv2.resize(frame, (cols, rows))
+            matrix = np.float32([[zoom, 0, (1 - zoom) * cols / 2],
+                                 [0, zoom, (1 - zoom) * rows / 2]])
+            frame = cv2.warpAffine(frame, matrix, (cols, rows), dst=self._buffer('zoom', frame.shape),
+                                   flags=cv2.INTER_LINEAR)
         
         return frame
 
+    def show_frame(self, frame):
+        frame = self.apply_transformations(frame)
+        frame = self.draw_overlay(frame)
+        height, width = frame.shape[:2]
+        frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=self._buffer('rgb', (height, width, 3)))
+        if (self._photo.width(), self._photo.height()) != (width, height):
+            # Orientation changed; paste needs an image of matching size
+            self._photo = ImageTk.PhotoImage(Image.new('RGB', (width, height)))
+            self.image_label.configure(image=self._photo)
+        self._photo.paste(Image.fromarray(frame))
+
+    def _on_frame_ready(self, fd, mask):
+        if self.running:
+            frame = self.camera.take_frame()
+            if frame is not None:
+                self.show_frame(frame)
+
     def update_frame(self):
         if self.running:
-            frame = self.camera.get_frame()
+            start = time.monotonic()
+            frame = self.camera.get_preview_frame()
             if frame is not None:
-                frame = self.apply_transformations(frame)
-                frame = self.draw_overlay(frame)
-                frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                photo = tk.PhotoImage(data=cv2.imencode('.ppm', frame)[1].tobytes())
-                self.image_label.configure(image=photo)
-                self.image_label.image = photo
-            self.root.after(10, self.update_frame)
+                self.show_frame(frame)
+            # Only one update is ever pending: wait out the rest of the frame budget, or if this
+            # frame overran it, let queued GUI events run first and skip straight to the latest frame
+            remaining = self.frame_interval - (time.monotonic() - start)
+            if remaining > 0:
+                self.root.after(int(remaining * 1000), self.update_frame)
+            else:
+                self.root.after_idle(self.update_frame)
 
     def stop(self):
         self.running = False
-        self.camera.stop()
+        with self._init_lock:
+            self._closed = True
+        try:
+            # Started, but closed before the Tk thread picked it up
+            camera, _ = self._init_result.get_nowait()
+            camera.stop()
+        except queue.Empty:
+            pass
+        if self._frame_handler:
+            self.root.tk.deletefilehandler(self.camera.fileno())
+            self._frame_handler = False
+        if self.camera:
+            self.camera.stop()
 
     def on_closing(self):
         self.stop()
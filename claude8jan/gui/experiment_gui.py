@@ -1,8 +1,23 @@
 import tkinter as tk
 from tkinter import filedialog, messagebox
+import json
 import os
+import queue
+import threading
 import time
-import cv2
+from config.settings import FILE_SETTINGS, WELL_PLATE_SETTINGS
+from utils.path_generator import WELL_NAMES, path_to_array
+
+try:
+    import orjson  # Optional, much faster path file parsing
+except ImportError:
+    orjson = None
+
+try:
+    import h5py
+    import hdf5plugin  # Registers the LZ4 filter with HDF5
+except ImportError:
+    h5py = None
 
 class ExperimentGUI:
     def __init__(self, root, checkbox_var, gcode=None, camera=None):
@@ -12,9 +27,20 @@ class ExperimentGUI:
         self.save_folder = ""
         self.is_running = False
         self.file_prefix = "fileprefix"
-        self.current_path = None
+        self.current_path = None  # (N, 3) array of X, Y, Z rows
+        self._scan_order = []  # (well name, (x, y, z)) in snake scan order, built once per loaded path
+        self._scan_commands = []  # Encoded G1 line per _scan_order entry, built at experiment start
         self.gcode = gcode
         self.camera = camera
+        self._stop_event = threading.Event()  # Stop signal of the current run; each run gets a new one
+        self._worker = None  # Experiment worker thread, until its 'finished' update has been handled
+        self._drain_job = None  # Pending after() id of _drain_ui_queue
+        self._ui_queue = queue.Queue()  # (kind, value) updates from the worker for the Tk thread
+        self._save_format = FILE_SETTINGS['image_format']  # Format of the running experiment: 'jpg' or 'h5'
+        self._write_queue = queue.Queue(maxsize=32)  # (well name, path, JPEG bytes or raw frame) for the writer thread
+        self._jpeg_buffers = queue.Queue()  # Reusable JPEG output buffers, handed back by the writer
+        for _ in range(4):
+            self._jpeg_buffers.put(bytearray())
         
     def init_gui(self):
         self.window = tk.Toplevel(self.root)
@@ -40,6 +66,9 @@ class ExperimentGUI:
         # Interval settings
         self.create_interval_section(main_frame)
         
+        # Output format
+        self.create_format_section(main_frame)
+        
         # Control buttons
         self.create_control_section(main_frame)
         
@@ -72,6 +101,18 @@ class ExperimentGUI:
         tk.Label(interval_frame, text="Minutes:").pack(side=tk.LEFT)
         tk.Entry(interval_frame, textvariable=self.interval_var, width=5).pack(side=tk.LEFT, padx=5)
 
+    def create_format_section(self, parent):
+        format_frame = tk.LabelFrame(parent, text="Save As", padx=5, pady=5)
+        format_frame.pack(fill=tk.X, pady=5)
+        
+        default = FILE_SETTINGS['image_format']
+        self.format_var = tk.StringVar(value=default if h5py or default != 'h5' else 'jpg')
+        tk.Radiobutton(format_frame, text="JPEG file per image", variable=self.format_var,
+                       value='jpg').pack(anchor=tk.W)
+        # Needs h5py and hdf5plugin
+        tk.Radiobutton(format_frame, text="HDF5 stack (raw frames, LZ4)", variable=self.format_var,
+                       value='h5', state=tk.NORMAL if h5py else tk.DISABLED).pack(anchor=tk.W)
+
     def load_path(self):
         """Load a saved well plate path"""
         filename = filedialog.askopenfilename(
@@ -81,11 +122,14 @@ class ExperimentGUI:
         
         if filename:
             try:
-                with open(filename, 'r') as f:
-                    path_data = json.load(f)
+                with open(filename, 'rb') as f:
+                    data = f.read()
+                path_data = orjson.loads(data) if orjson else json.loads(data)
                     
-                self.current_path = path_data['path']
+                # Older files store the points as X/Y/Z dicts, newer ones as [x, y, z] rows
+                self.current_path = path_to_array(path_data['path'])
                 self.well_positions = path_data['well_positions']
+                self._scan_order = self.build_scan_order(self.current_path)
                 self.path_var.set(filename)
                 
                 self.status_var.set(f"Loaded path with {len(self.current_path)} points")
@@ -94,7 +138,11 @@ class ExperimentGUI:
                 messagebox.showerror("Error", f"Failed to load path: {str(e)}")
 
     def start_experiment(self):
-        if not self.current_path:
+        if self._worker is not None and self._worker.is_alive():
+            messagebox.showerror("Error", "The previous experiment is still stopping, please wait")
+            return
+        
+        if self.current_path is None:
             messagebox.showerror("Error", "Please load a path first")
             return
 
@@ -121,84 +169,237 @@ class ExperimentGUI:
                 messagebox.showerror("Error", "Please set an interval greater than 0")
                 return
                 
+            if self.gcode:
+                # Format and encode every move once; the capture passes replay the same bytes
+                self._scan_commands = self.gcode.prepare_path_commands(
+                    [point for _, point in self._scan_order])
+                
+            # The worker threads read the format from here, not from the Tk variable
+            self._save_format = self.format_var.get()
             self.is_running = True
             self.start_button.config(state=tk.DISABLED)
             self.stop_button.config(state=tk.NORMAL)
             self.status_var.set("Experiment running...")
             
             # Start the experiment loop
-            self.run_experiment(hours, minutes, seconds, interval_minutes)
+            self.run_experiment(hours * 3600 + minutes * 60 + seconds, interval_minutes * 60)
             
         except ValueError:
             messagebox.showerror("Error", "Please enter valid numbers for duration and interval")
             return
 
-    def run_experiment(self, hours, minutes, seconds, interval_minutes):
-        total_seconds = hours * 3600 + minutes * 60 + seconds
-        interval_seconds = interval_minutes * 60
-        end_time = time.time() + total_seconds
-        next_capture_time = time.time()
+    def run_experiment(self, total_seconds, interval_seconds):
+        """Run capture passes every interval_seconds for total_seconds"""
+        # Timing, moves and image IO run on a worker; the Tk thread only drains UI updates.
+        # The run's threads only ever see its own stop event, never a later run's
+        stop_event = self._stop_event = threading.Event()
+        # Drop updates left over from the previous run
+        try:
+            while True:
+                self._ui_queue.get_nowait()
+        except queue.Empty:
+            pass
+        if self._drain_job is not None:
+            self.window.after_cancel(self._drain_job)
+        self._worker = threading.Thread(target=self._experiment_worker,
+                                        args=(total_seconds, interval_seconds, stop_event), daemon=True)
+        self._worker.start()
+        self._drain_ui_queue()
+
+    def _experiment_worker(self, total_seconds, interval_seconds, stop_event):
+        """Worker thread: run capture passes every interval until the duration is up or stop_event is set"""
+        writer = threading.Thread(target=self._writer_loop, args=(stop_event,), daemon=True)
+        writer.start()
+        try:
+            self._run_captures(total_seconds, interval_seconds, stop_event)
+        finally:
+            # Let the writer finish everything already captured before the run ends
+            self._write_queue.put(None)
+            writer.join()
+            self._ui_queue.put(('finished', None))
+
+    def _writer_loop(self, stop_event):
+        """Writer thread: save images so disk IO overlaps with stage moves
+
+        On any save error the run is stopped and reported, and the writer keeps taking
+        items off the queue (discarding them) so the capture side can never block on it.
+        """
+        stack = None
+        failed = False
+        if self._save_format == 'h5':
+            stack_path = os.path.join(self.save_folder, f"{self.file_prefix}.h5")
+            try:
+                stack = h5py.File(stack_path, 'a', libver='latest')
+            except Exception as e:
+                self._fail_run(f"Could not open {stack_path}: {e}", stop_event)
+                failed = True
+        try:
+            while True:
+                item = self._write_queue.get()
+                if item is None:
+                    return
+                well_name, filepath, data = item
+                try:
+                    if failed:
+                        continue
+                    if stack is not None:
+                        self._append_frame(stack, well_name, data)
+                    else:
+                        with open(filepath, 'wb', buffering=1 << 20) as f:
+                            f.write(data)
+                except Exception as e:
+                    self._fail_run(f"Error saving {filepath}: {e}", stop_event)
+                    failed = True
+                finally:
+                    if isinstance(data, memoryview):
+                        # Encoded into one of our buffers; give it back for the next capture
+                        buf = data.obj
+                        data.release()
+                        self._jpeg_buffers.put(buf)
+        finally:
+            if stack is not None:
+                try:
+                    stack.close()
+                except Exception as e:
+                    print(f"Error closing HDF5 stack: {e}")
+
+    def _fail_run(self, message, stop_event):
+        """Stop the run from a worker thread and have the Tk thread report why"""
+        print(message)
+        stop_event.set()
+        self._ui_queue.put(('error', message))
+
+    def _append_frame(self, stack, well_name, frame):
+        """Append a raw frame and its capture time to the well's time-lapse in the HDF5 stack"""
+        if well_name not in stack:
+            group = stack.create_group(well_name)
+            # One frame per chunk, byte-shuffled then LZ4 compressed
+            group.create_dataset('frames', shape=(0,) + frame.shape, maxshape=(None,) + frame.shape,
+                                 chunks=(1,) + frame.shape, dtype=frame.dtype,
+                                 shuffle=True, **hdf5plugin.LZ4())
+            group.create_dataset('timestamps', shape=(0,), maxshape=(None,), dtype='f8')
+        group = stack[well_name]
+        frames, timestamps = group['frames'], group['timestamps']
+        n = frames.shape[0]
+        frames.resize(n + 1, axis=0)
+        frames[n] = frame
+        timestamps.resize(n + 1, axis=0)
+        timestamps[n] = time.time()
+        stack.flush()
+
+    def _run_captures(self, total_seconds, interval_seconds, stop_event):
+        # Integer nanosecond schedule: captures stay on a fixed grid from the start time
+        interval_ns = int(interval_seconds * 1_000_000_000)
+        end_ns = time.monotonic_ns() + int(total_seconds * 1_000_000_000)
+        next_capture_ns = time.monotonic_ns()
+        last_remaining = None
         
-        def update():
-            if not self.is_running:
+        while not stop_event.is_set():
+            now = time.monotonic_ns()
+            if now >= end_ns:
+                self._ui_queue.put(('done', None))
                 return
-                
-            current_time = time.time()
             
             # Check if it's time for the next capture
-            if current_time >= next_capture_time:
-                self.capture_well_images()
-                next_capture_time = current_time + interval_seconds
+            if now >= next_capture_ns:
+                self.capture_well_images(stop_event)
+                next_capture_ns += interval_ns
+                late_ns = time.monotonic_ns() - next_capture_ns
+                if late_ns >= 0:
+                    # The pass overran one or more intervals; skip the missed slots rather than bunching up
+                    next_capture_ns += (late_ns // interval_ns + 1) * interval_ns
+                continue
             
-            # Update remaining time display
-            if current_time < end_time:
-                remaining = end_time - current_time
-                hours_left = int(remaining // 3600)
-                minutes_left = int((remaining % 3600) // 60)
-                seconds_left = int(remaining % 60)
-                
-                self.status_var.set(
-                    f"Running... Time remaining: {hours_left:02d}:{minutes_left:02d}:{seconds_left:02d}"
-                )
-                
-                # Schedule next update
-                self.window.after(1000, update)
-            else:
-                self.stop_experiment()
-                
-        # Start the update loop
-        update()
+            # Update remaining time display, only when the shown second changes
+            remaining = (end_ns - now) // 1_000_000_000
+            if remaining != last_remaining:
+                last_remaining = remaining
+                hours_left, rest = divmod(remaining, 3600)
+                minutes_left, seconds_left = divmod(rest, 60)
+                self._ui_queue.put(('status',
+                                    f"Running... Time remaining: {hours_left:02d}:{minutes_left:02d}:{seconds_left:02d}"))
+            
+            # Sleep until the countdown ticks over or the next capture is due, whichever is first
+            wake_ns = min(end_ns - remaining * 1_000_000_000, next_capture_ns)
+            stop_event.wait(max(0, wake_ns - now) / 1_000_000_000)
 
-    def capture_well_images(self):
-        """Capture images for all wells in the path"""
-        for i, point in enumerate(self.current_path):
-            if not self.is_running:
+    def _drain_ui_queue(self):
+        """Apply queued worker updates on the Tk thread, until the worker has finished"""
+        self._drain_job = None
+        if self.window is None:
+            return  # Window closed; the worker still stops on its own
+        try:
+            while True:
+                kind, value = self._ui_queue.get_nowait()
+                if kind == 'status':
+                    self.status_var.set(value)
+                elif kind == 'well':
+                    self.well_var.set(value)
+                elif kind == 'done':
+                    self.stop_experiment()
+                elif kind == 'error':
+                    self.stop_experiment()
+                    messagebox.showerror("Error", value)
+                elif kind == 'finished':
+                    # Moves and writes are all done; only now can another run start
+                    self._worker = None
+                    self.start_button.config(state=tk.NORMAL)
+                    self.status_var.set("Experiment stopped")
+                    return
+        except queue.Empty:
+            pass
+        self._drain_job = self.window.after(100, self._drain_ui_queue)
+
+    def capture_well_images(self, stop_event):
+        """Capture images for all wells in the path (runs on the experiment worker)"""
+        for i, (well_name, point) in enumerate(self._scan_order):
+            if stop_event.is_set():
                 break
                 
-            # Move to the well position
+            # Queue the prepared move (no per-command ok wait), then let M400 report when it has finished
             if self.gcode:
-                self.gcode.move_xyz(point['X'], point['Y'], point['Z'])
-                time.sleep(0.5)  # Wait for movement to complete
+                self.gcode.send_gcode_bytes(self._scan_commands[i], position=point)
+                self.gcode.wait_for_moves()
             
             # Update current well display
-            well_name = self.get_well_name(i)
-            self.well_var.set(f"Current Well: {well_name}")
+            self._ui_queue.put(('well', f"Current Well: {well_name}"))
             
             # Capture image if camera is available
             if self.camera:
-                timestamp = time.strftime("%Y%m%d-%H%M%S")
-                filename = f"{self.file_prefix}_{well_name}_{timestamp}.jpg"
-                filepath = os.path.join(self.save_folder, filename)
-                
-                frame = self.camera.get_frame()
-                if frame is not None:
-                    cv2.imwrite(filepath, frame)
+                if self._save_format == 'h5':
+                    # Raw frame goes into the HDF5 stack; the writer thread compresses and appends it
+                    filepath = os.path.join(self.save_folder, f"{self.file_prefix}.h5")
+                    data = self.camera.get_frame()
+                else:
+                    timestamp = time.strftime("%Y%m%d-%H%M%S")
+                    filename = f"{self.file_prefix}_{well_name}_{timestamp}.jpg"
+                    filepath = os.path.join(self.save_folder, filename)
+                    # Encode in memory, into a reused buffer where the camera supports it;
+                    # the writer thread does the file IO and returns the buffer
+                    buf = self._jpeg_buffers.get()
+                    data = self.camera.capture_jpeg(quality=90, dst=buf)
+                    if not (isinstance(data, memoryview) and data.obj is buf):
+                        self._jpeg_buffers.put(buf)
+                # Blocks only if 32 images are pending
+                if data is not None:
+                    self._write_queue.put((well_name, filepath, data))
+
+    def build_scan_order(self, path):
+        """Pair each point with its well name and order the plate rows as a snake scan (A1..A8, B8..B1, ...)"""
+        pairs = list(zip(WELL_NAMES, (tuple(p) for p in path.tolist())))  # Plain floats for the G-code strings
+        rows = WELL_PLATE_SETTINGS['rows']
+        if len(pairs) % rows:
+            return pairs  # Not a full plate grid; keep the path order
+        cols = len(pairs) // rows
+        order = []
+        for r in range(rows):
+            row = pairs[r * cols:(r + 1) * cols]
+            order.extend(reversed(row) if r % 2 else row)
+        return order
 
     def get_well_name(self, index):
         """Convert numerical index to well name (A1, A2, etc.)"""
-        row = chr(65 + (index // 8))  # A, B, C, ...
-        col = (index % 8) + 1         # 1, 2, 3, ...
-        return f"{row}{col}"
+        return WELL_NAMES[index]
 
     def create_folder_section(self, parent):
         folder_frame = tk.LabelFrame(parent, text="Save Location", padx=5, pady=5)
@@ -263,69 +464,18 @@ class ExperimentGUI:
             self.save_folder = folder
             self.folder_path.set(folder)
 
-    def start_experiment(self):
-        if not self.save_folder:
-            messagebox.showerror("Error", "Please select a save folder first")
-            return
-
-        self.file_prefix = self.prefix_var.get()
-        if not self.file_prefix:
-            messagebox.showerror("Error", "Please enter a file prefix")
-            return
-            
-        try:
-            hours = int(self.hours_var.get())
-            minutes = int(self.minutes_var.get())
-            seconds = int(self.seconds_var.get())
-            
-            if hours == 0 and minutes == 0 and seconds == 0:
-                messagebox.showerror("Error", "Please set a duration greater than 0")
-                return
-                
-            self.is_running = True
-            self.start_button.config(state=tk.DISABLED)
-            self.stop_button.config(state=tk.NORMAL)
-            self.status_var.set("Experiment running...")
-            
-            # Start the experiment loop
-            self.run_experiment(hours, minutes, seconds)
-            
-        except ValueError:
-            messagebox.showerror("Error", "Please enter valid numbers for duration")
-            return
-
-    def run_experiment(self, hours, minutes, seconds):
-        total_seconds = hours * 3600 + minutes * 60 + seconds
-        end_time = time.time() + total_seconds
-        
-        def update():
-            if not self.is_running:
-                return
-                
-            current_time = time.time()
-            if current_time < end_time:
-                remaining = end_time - current_time
-                hours_left = int(remaining // 3600)
-                minutes_left = int((remaining % 3600) // 60)
-                seconds_left = int(remaining % 60)
-                
-                self.status_var.set(
-                    f"Running... Time remaining: {hours_left:02d}:{minutes_left:02d}:{seconds_left:02d}"
-                )
-                
-                # Schedule the next update
-                self.window.after(1000, update)
-            else:
-                self.stop_experiment()
-                
-        # Start the update loop
-        update()
-
     def stop_experiment(self):
         self.is_running = False
-        self.start_button.config(state=tk.NORMAL)
+        self._stop_event.set()
         self.stop_button.config(state=tk.DISABLED)
-        self.status_var.set("Experiment stopped")
+        if self._worker is not None and self._worker.is_alive():
+            # Start is re-enabled by the worker's 'finished' update
+            self.start_button.config(state=tk.DISABLED)
+            self.status_var.set("Stopping...")
+        else:
+            self._worker = None
+            self.start_button.config(state=tk.NORMAL)
+            self.status_var.set("Experiment stopped")
 
     def start(self):
         if self.window is None:
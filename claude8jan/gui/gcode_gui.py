@@ -33,6 +33,7 @@ class GCodeGUI:
 
     def create_coordinate_controls(self):
         # XYZ Coordinates Entry
+        self.axis_entries = {}
         for i, axis in enumerate(['X', 'Y', 'Z']):
             label = tk.Label(self.frame, text=f"{axis}:")
             label.grid(row=i, column=0, padx=5, pady=5)
@@ -40,7 +41,7 @@ class GCodeGUI:
             entry = tk.Entry(self.frame)
             entry.grid(row=i, column=1, padx=5, pady=5)
             entry.insert(0, str(self.gcode.current_position[axis]))
-            setattr(self, f"{axis.lower()}_entry", entry)
+            self.axis_entries[axis] = entry
 
         # Send coordinates button
         self.send_button = tk.Button(
@@ -111,6 +112,7 @@ class GCodeGUI:
             ("Jerk (mm/s):", "jerk")
         ]
 
+        self.settings_entries = {}
         for i, (label_text, attr) in enumerate(settings):
             tk.Label(self.frame, text=label_text).grid(
                 row=7+i, column=0, padx=5, pady=5
@@ -119,7 +121,7 @@ class GCodeGUI:
             entry = tk.Entry(self.frame)
             entry.grid(row=7+i, column=1, padx=5, pady=5)
             entry.insert(0, str(getattr(self.gcode, attr)))
-            setattr(self, f"{attr}_entry", entry)
+            self.settings_entries[attr] = entry
 
         tk.Button(
             self.frame,
@@ -129,21 +131,19 @@ class GCodeGUI:
 
     def move_increment(self, axis, direction):
         step = self.step_size.get() * direction
-        current = self.gcode.current_position[axis]
-        new_pos = max(0, current + step)
+        x, y, z = self.gcode.get_position()
         
         if axis == 'X':
-            self.gcode.move_xyz(new_pos, self.gcode.current_position['Y'], self.gcode.current_position['Z'])
+            self.gcode.move_xyz_async(max(0, x + step), y, z)
         elif axis == 'Y':
-            self.gcode.move_xyz(self.gcode.current_position['X'], new_pos, self.gcode.current_position['Z'])
+            self.gcode.move_xyz_async(x, max(0, y + step), z)
         elif axis == 'Z':
-            self.gcode.move_xyz(self.gcode.current_position['X'], self.gcode.current_position['Y'], new_pos)
+            self.gcode.move_xyz_async(x, y, max(0, z + step))
             
         self.update_position_displays()
 
     def update_position_displays(self):
-        for axis in ['X', 'Y', 'Z']:
-            entry = getattr(self, f"{axis.lower()}_entry")
+        for axis, entry in self.axis_entries.items():
             entry.delete(0, tk.END)
             entry.insert(0, str(self.gcode.current_position[axis]))
 
@@ -153,18 +153,16 @@ class GCodeGUI:
 
     def send_to_printer(self):
         try:
-            x = float(self.x_entry.get())
-            y = float(self.y_entry.get())
-            z = float(self.z_entry.get())
+            x, y, z = (float(self.axis_entries[axis].get()) for axis in ('X', 'Y', 'Z'))
             self.gcode.move_xyz(x, y, z)
         except ValueError:
             print("Invalid coordinates!")
 
     def apply_settings(self):
         try:
-            self.gcode.set_feedrate(float(self.feedrate_entry.get()))
-            self.gcode.set_acceleration(float(self.acceleration_entry.get()))
-            self.gcode.set_jerk(float(self.jerk_entry.get()))
+            self.gcode.set_feedrate(float(self.settings_entries['feedrate'].get()))
+            self.gcode.set_acceleration(float(self.settings_entries['acceleration'].get()))
+            self.gcode.set_jerk(float(self.settings_entries['jerk'].get()))
         except ValueError:
             print("Invalid settings values!")
 
@@ -1,6 +1,13 @@
 import tkinter as tk
-from tkinter import messagebox
-from utils.path_generator import generate_well_plate_path
+from tkinter import filedialog, messagebox
+import json
+import time
+from utils.path_generator import WELL_NAMES, generate_well_plate_path
+
+try:
+    import orjson  # Optional, much faster path file writing
+except ImportError:
+    orjson = None
 
 class PathfinderGUI:
     def __init__(self, root, gcode):
@@ -14,7 +21,7 @@ class PathfinderGUI:
             'A1': None, 'A8': None,
             'F8': None, 'F1': None
         }
-        self.generated_path = None  # Store the generated path
+        self.generated_path = None  # Store the generated path, an (N, 3) array of X, Y, Z rows
         
         self.setup_gui()
         
@@ -49,11 +56,8 @@ class PathfinderGUI:
             
     def capture_well_position(self, well):
         """Capture the current position for the specified well"""
-        position = {
-            'X': self.gcode.current_position['X'],
-            'Y': self.gcode.current_position['Y'],
-            'Z': self.gcode.current_position['Z']
-        }
+        x, y, z = self.gcode.get_position()
+        position = {'X': x, 'Y': y, 'Z': z}
         self.well_positions[well] = position
         
         # Update label
@@ -90,7 +94,7 @@ class PathfinderGUI:
 
     def export_path(self):
         """Export the generated path to a file"""
-        if not self.generated_path:
+        if self.generated_path is None:
             messagebox.showerror("Error", "No path generated to export")
             return
             
@@ -104,15 +108,20 @@ class PathfinderGUI:
             try:
                 path_data = {
                     'well_positions': self.well_positions,
-                    'path': self.generated_path,
+                    'path': self.generated_path.tolist(),  # [x, y, z] rows
                     'metadata': {
                         'timestamp': time.strftime("%Y%m%d-%H%M%S"),
                         'num_points': len(self.generated_path)
                     }
                 }
                 
-                with open(filename, 'w') as f:
-                    json.dump(path_data, f, indent=2)
+                if orjson:
+                    data = orjson.dumps(path_data, option=orjson.OPT_INDENT_2)
+                else:
+                    # Compact output: the stdlib's indent handling dominates dump time on long paths
+                    data = json.dumps(path_data, separators=(',', ':')).encode('utf-8')
+                with open(filename, 'wb') as f:
+                    f.write(data)
                     
                 self.status_var.set(f"Path exported to {filename}")
                 
@@ -128,20 +137,16 @@ class PathfinderGUI:
         text_widget = tk.Text(preview_window, height=20, width=50)
         text_widget.pack(padx=10, pady=10)
         
-        # Insert path information
-        text_widget.insert(tk.END, "Generated Path:\n\n")
-        for i, point in enumerate(self.path):
-            well_name = self.get_well_name(i)
-            text_widget.insert(tk.END, 
-                f"{well_name}: X={point['X']:.2f}, Y={point['Y']:.2f}, Z={point['Z']:.2f}\n")
+        # Insert path information in one call rather than one insert per point
+        lines = [f"{name}: X={x:.2f}, Y={y:.2f}, Z={z:.2f}\n"
+                 for name, (x, y, z) in zip(WELL_NAMES, self.generated_path.tolist())]
+        text_widget.insert(tk.END, "Generated Path:\n\n" + "".join(lines))
         
         text_widget.config(state=tk.DISABLED)
         
     def get_well_name(self, index):
         """Convert numerical index to well name (A1, A2, etc.)"""
-        row = chr(65 + (index // 8))  # A, B, C, ...
-        col = (index % 8) + 1         # 1, 2, 3, ...
-        return f"{row}{col}"
+        return WELL_NAMES[index]
         
     def save_path(self):
         """Save the generated path"""
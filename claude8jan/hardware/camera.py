@@ -1,31 +1,87 @@
+import io
+import os
+import threading
 import cv2
 from picamera2 import Picamera2
 
+try:
+    from turbojpeg import TurboJPEG, TJPF_BGR
+    _turbo = TurboJPEG()
+except (ImportError, OSError):  # optional, also needs the libturbojpeg shared library
+    _turbo = None
+
 class Camera:
     def __init__(self):
         self.capture = cv2.VideoCapture(0)
         if not self.capture.isOpened():
             raise Exception("Could not open video device")
+        # A grabber thread keeps reading so get_frame never waits for the next frame period
+        self._latest = None
+        self._first_frame = threading.Event()
+        self._running = True
+        self._thread = threading.Thread(target=self._grab_loop, daemon=True)
+        self._thread.start()
+
+    def _grab_loop(self):
+        while self._running:
+            ret, frame = self.capture.read()
+            if ret:
+                self._latest = frame
+                self._first_frame.set()
 
     def get_frame(self):
-        ret, frame = self.capture.read()
-        if not ret:
+        """Return the most recent frame (shared; copy it before drawing on it if the original matters)."""
+        self._first_frame.wait(timeout=2)
+        frame = self._latest
+        if frame is None:
             raise Exception("Failed to grab frame")
         return frame
 
+    def capture_jpeg(self, quality=90, dst=None):
+        """Return the current frame encoded as JPEG: bytes, or a memoryview into the bytearray dst if given."""
+        frame = self.get_frame()
+        if _turbo is not None:
+            if dst is None:
+                return _turbo.encode(frame, quality=quality, pixel_format=TJPF_BGR)
+            # Encode in place; grown once, then the same buffer is reused for every frame
+            need = 2 * frame.nbytes  # Above libjpeg-turbo's worst-case JPEG size
+            if len(dst) < need:
+                dst.extend(bytes(need - len(dst)))
+            _, size = _turbo.encode(frame, quality=quality, pixel_format=TJPF_BGR, dst=dst)
+            return memoryview(dst)[:size]
+        ok, encoded = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        if not ok:
+            raise Exception("Failed to encode frame")
+        return encoded.tobytes()
+
     def release(self):
+        self._running = False
+        self._thread.join(timeout=1)
         self.capture.release()
 
 class PiCamera:
+    PREVIEW_SIZE = (640, 480)  # Scaled down by the ISP for the live view
+    FULL_SIZE = (2028, 1520)  # Saved images
+
     def __init__(self):
         self.picam2 = None
         self.running = False
+        self._latest = None  # Newest preview (lores, YUV420) frame delivered by the camera thread
+        self._notify_r = self._notify_w = None  # Pipe signalling that _latest was refreshed
 
     def initialize(self):
         try:
             self.picam2 = Picamera2()
-            picam2_config = self.picam2.create_preview_configuration(main={"size": (640, 480)})
+            # The live view reads the ISP-downscaled lores stream; main is only read for captures
+            picam2_config = self.picam2.create_preview_configuration(
+                main={"size": self.FULL_SIZE},
+                lores={"size": self.PREVIEW_SIZE, "format": "YUV420"})
             self.picam2.configure(picam2_config)
+            # Frames are handed over as they complete; the pipe lets an event loop wait on them
+            self._notify_r, self._notify_w = os.pipe()
+            os.set_blocking(self._notify_r, False)
+            os.set_blocking(self._notify_w, False)
+            self.picam2.post_callback = self._on_request
             self.picam2.start()
             self.running = True
             return True
@@ -37,11 +93,61 @@ class PiCamera:
             self.running = False
             return False
 
-    def get_frame(self):
+    def _on_request(self, request):
+        # Runs on the camera thread for every completed request
+        self._latest = request.make_array("lores")
+        try:
+            os.write(self._notify_w, b'\0')
+        except BlockingIOError:
+            pass  # Reader is behind; one pending byte is enough to wake it
+
+    def fileno(self):
+        """Readable whenever a new frame is waiting in take_frame()."""
+        return self._notify_r
+
+    def take_frame(self):
+        """Return the newest delivered preview frame as BGR (or None) and clear the frame-ready signal."""
+        try:
+            while os.read(self._notify_r, 4096):
+                pass
+        except BlockingIOError:
+            pass
+        frame, self._latest = self._latest, None
+        if frame is None:
+            return None
+        return cv2.cvtColor(frame, cv2.COLOR_YUV2BGR_I420)
+
+    def get_preview_frame(self):
+        """Return the next preview-size frame as BGR, or None if the camera isn't running."""
+        if self.running and self.picam2:
+            return cv2.cvtColor(self.picam2.capture_array("lores"), cv2.COLOR_YUV2BGR_I420)
+        return None
+
+    def get_full_frame(self):
+        """Return the next full-size frame, or None if the camera isn't running."""
         if self.running and self.picam2:
-            return self.picam2.capture_array("main")
+            # Build the array straight from the request's mapped buffer and hand the buffer
+            # back to libcamera as soon as that's done
+            request = self.picam2.capture_request()
+            try:
+                return request.make_array("main")
+            finally:
+                request.release()
         return None
 
+    get_frame = get_full_frame  # Same call as Camera.get_frame, for saving images
+
+    def capture_jpeg(self, quality=90, dst=None):
+        """Return the next frame encoded as JPEG bytes, or None if the camera isn't running (dst is ignored)."""
+        if not (self.running and self.picam2):
+            return None
+        # Picamera2 encodes straight from the request buffer, in the right color order,
+        # without building a numpy frame first
+        self.picam2.options["quality"] = quality
+        data = io.BytesIO()
+        self.picam2.capture_file(data, name="main", format="jpeg")
+        return data.getvalue()
+
     def stop(self):
         self.running = False
         if self.picam2:
@@ -50,4 +156,8 @@ class PiCamera:
                 self.picam2.close()
                 self.picam2 = None
             except Exception as e:
-                print(f"Error stopping camera: {e}")
\ No newline at end of file
+                print(f"Error stopping camera: {e}")
+        for fd in (self._notify_r, self._notify_w):
+            if fd is not None:
+                os.close(fd)
+        self._notify_r = self._notify_w = None
\ No newline at end of file
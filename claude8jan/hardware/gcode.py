@@ -1,9 +1,21 @@
 import serial
 import serial.tools.list_ports
+import collections
+import logging
+import os
+import sys
 import threading
 import time
 
+from .gcode_lines import encode_path_moves
+
+logger = logging.getLogger(__name__)
+
 class GCode:
+    PLANNER_DEPTH = 4  # Unacknowledged commands allowed in flight by the non-blocking senders
+    PORT_CACHE_TTL = 30.0  # Seconds a comports() scan is reused before rescanning
+    _port_cache = {'listed_at': None, 'devices': [], 'verified': set()}  # Shared by all instances
+
     def __init__(self, baudrate=250000, feedrate=2000, acceleration=5, jerk=1):
         """Initialize the GCode class with default baudrate and G-code settings."""
         self.baud_rate = baudrate
@@ -16,21 +28,38 @@ class GCode:
         self.acceleration = acceleration
         self.jerk = jerk
         self.waiting_for_response = False
-        self.last_response = None
+        self._responses = collections.deque()  # Lines (bytes) received while send_gcode is waiting
+        self._response_event = threading.Event()  # Set by the listener when a line is queued
+        self._in_flight = 0  # Commands written by send_gcode_nowait whose 'ok' hasn't arrived yet
+        self._ack_cond = threading.Condition()
+        self._rx_buf = bytearray()  # Received bytes not yet ending in a newline
+        self._stop = threading.Event()  # Tells the listener thread to exit
         self.connect_to_printer()  # Connect on initialization
 
     def find_serial_port(self):
         """Find available serial ports and select the correct one."""
-        ports = serial.tools.list_ports.comports()
-        for port in ports:
-            if 'USB' in port.description:  # Check if it's a USB serial port
-                try:
-                    # Try opening the port to verify it works
-                    ser = serial.Serial(port.device, self.baud_rate, timeout=1)
-                    ser.close()  # Close the port if it connects successfully
-                    return port.device
-                except serial.SerialException:
-                    print(f"Failed to connect on {port.device}")
+        cache = GCode._port_cache
+        now = time.monotonic()
+        if cache['listed_at'] is None or now - cache['listed_at'] > self.PORT_CACHE_TTL:
+            # Rescan, keeping only the USB serial ports; a port already verified stays verified
+            # as long as its device node is still there
+            cache['devices'] = [port.device for port in serial.tools.list_ports.comports()
+                                if 'USB' in port.description]
+            cache['verified'] &= set(cache['devices'])
+            cache['listed_at'] = now
+
+        verified = cache['verified']
+        for device in cache['devices']:
+            if device in verified:
+                return device
+            try:
+                # Try opening the port to verify it works
+                ser = serial.Serial(device, self.baud_rate, timeout=1)
+                ser.close()  # Close the port if it connects successfully
+                verified.add(device)
+                return device
+            except serial.SerialException:
+                print(f"Failed to connect on {device}")
         return None
 
     def connect_to_printer(self):
@@ -38,16 +67,18 @@ class GCode:
         serial_port = self.find_serial_port()
         if serial_port:
             try:
-                self.printer_on_serial = serial.Serial(serial_port, self.baud_rate, timeout=1)
+                # Short read timeout: the listener blocks in read() and rechecks connected this often
+                self.printer_on_serial = serial.Serial(serial_port, self.baud_rate, timeout=0.1)
+                self._set_low_latency()
                 self.connected = True
                 print(f"Connected to printer on {serial_port} at {self.baud_rate} baud.")
                 
                 # Start the listener thread immediately
-                print("Starting listener thread")
+                logger.debug("Starting listener thread")
                 self.listener_thread = threading.Thread(target=self.listen_to_printer_output)
                 self.listener_thread.daemon = True
                 self.listener_thread.start()
-                print("Listener thread started")
+                logger.debug("Listener thread started")
                 
                 # Wait for the printer to initialize
                 time.sleep(2)
@@ -63,65 +94,117 @@ class GCode:
             print("No valid serial port found.")
             self.connected = False
 
+    def _set_low_latency(self):
+        """Ask the USB-serial driver to pass bytes on immediately instead of batching them (Linux only)."""
+        if not sys.platform.startswith('linux'):
+            return
+        ser = self.printer_on_serial
+        try:
+            # TIOCGSERIAL/TIOCSSERIAL with ASYNC_LOW_LATENCY; FTDI drops its latency timer to 1 ms
+            ser.set_low_latency_mode(True)
+            return
+        except (AttributeError, ValueError, OSError):
+            pass  # Driver doesn't support the flag
+        # Fall back to the usb-serial latency timer, where the driver exposes one (needs write access)
+        timer = f"/sys/bus/usb-serial/devices/{os.path.basename(ser.port)}/latency_timer"
+        try:
+            with open(timer, 'w') as f:
+                f.write('1')
+        except OSError:
+            pass
+
     def listen_to_printer_output(self):
         """Listen for data coming from the printer."""
-        print("Listener thread started running")
-        while self.connected:
-            if self.printer_on_serial and self.printer_on_serial.in_waiting > 0:
-                try:
-                    response = self.printer_on_serial.readline().decode('utf-8', errors='ignore').strip()
-                    print(f"Raw response: '{response}'")
-                    if self.waiting_for_response:
-                        print(f"Storing response: '{response}'")
-                        self.last_response = response
-                    else:
-                        print(f"Printing response: '{response}'")
-                        print(f"Printer: {response}")
-                except UnicodeDecodeError as e:
-                    print(f"UnicodeDecodeError: Failed to decode data from printer: {e}")
-            time.sleep(0.01)
-        print("Listener thread exiting")
+        logger.debug("Listener thread started running")
+        while not self._stop.is_set():
+            ser = self.printer_on_serial
+            if not ser:
+                break
+            try:
+                # Everything that has arrived in one read; when nothing has, block until the
+                # first byte does (or the port timeout passes) instead of sleeping and polling
+                chunk = ser.read(ser.in_waiting or 1)
+            except serial.SerialException as e:
+                if not self._stop.is_set():
+                    print(f"Serial read failed: {e}")
+                break
+            if chunk:
+                self._rx_buf += chunk
+                while b'\n' in self._rx_buf:
+                    line, _, self._rx_buf = self._rx_buf.partition(b'\n')
+                    self._handle_response(line)
+        logger.debug("Listener thread exiting")
+
+    def _handle_response(self, line):
+        """Dispatch one line received from the printer (kept as bytes; Marlin replies in ASCII)."""
+        response = line.strip()
+        logger.debug("Raw response: %s", response)
+        if self._in_flight and b'ok' in response.lower():
+            # Acknowledges the oldest pipelined command
+            with self._ack_cond:
+                self._in_flight -= 1
+                self._ack_cond.notify_all()
+        elif self.waiting_for_response:
+            logger.debug("Storing response: %s", response)
+            self._responses.append(response)
+            self._response_event.set()
+        else:
+            print(f"Printer: {response.decode('ascii', errors='replace')}")
+
+    @staticmethod
+    def _as_line(command):
+        """Return a str or bytes command as newline-terminated ASCII bytes."""
+        if isinstance(command, str):
+            command = command.encode('ascii')
+        return command if command.endswith(b'\n') else command + b'\n'
 
     def send_gcode(self, command):
-        """Send a G-code command and wait for acknowledgment."""
+        """Send a G-code command (str or bytes) and wait for acknowledgment."""
         if not self.printer_on_serial:
             print("No printer connected.")
             return False
 
+        # Let windowed commands be acknowledged first so their 'ok's aren't taken for this one
+        if not self.drain():
+            print("Timed out waiting for queued commands")
+            return False
+
         try:
-            # Clear any pending data
-            self.printer_on_serial.reset_input_buffer()
-            self.last_response = None
-            
-            # Set waiting flag before sending command
+            # Set waiting flag before sending command; the listener queues every line from here on
             self.waiting_for_response = True
-            print(f"Set waiting_for_response to True")
+            logger.debug("Set waiting_for_response to True")
+            
+            # Drop lines left over from earlier commands. The port itself isn't flushed: the
+            # listener frames lines in order, and Marlin answers each one with exactly one ok
+            self._responses.clear()
+            self._response_event.clear()
             
             # Send the command
-            print(f"Sending: {command}")
-            self.printer_on_serial.write((command + '\n').encode('utf-8'))
+            line = self._as_line(command)
+            logger.debug("Sending: %s", line)
+            self.printer_on_serial.write(line)
             
             # Set timeout based on command
-            timeout = 30 if command.startswith('G28') else 10  # 30 seconds for homing, 10 for others
+            timeout = 30 if line.startswith((b'G28', b'M400')) else 10  # 30 seconds for homing/move waits, 10 for others
             
-            # Wait for acknowledgment with timeout
-            start_time = time.time()
-            while time.time() - start_time < timeout:
-                if self.last_response is not None:
-                    response = self.last_response
-                    print(f"Got response: '{response}'")
-                    self.last_response = None  # Clear the response
+            # Sleep until the listener queues a line, then check everything it has queued
+            deadline = time.monotonic() + timeout
+            while self._response_event.wait(deadline - time.monotonic()):
+                self._response_event.clear()
+                while self._responses:
+                    response = self._responses.popleft()
+                    logger.debug("Got response: %s", response)
                     
                     # Check for acknowledgment
-                    if 'ok' in response.lower():
-                        print("Found 'ok' in response")
+                    lowered = response.lower()
+                    if b'ok' in lowered:
+                        logger.debug("Found 'ok' in response")
                         self.waiting_for_response = False
                         return True
-                    elif 'error' in response.lower():
-                        print(f"Error response from printer: {response}")
+                    elif b'error' in lowered:
+                        print(f"Error response from printer: {response.decode('ascii', errors='replace')}")
                         self.waiting_for_response = False
                         return False
-                time.sleep(0.01)
             
             print(f"{timeout}s timeout occurred")
             self.waiting_for_response = False
@@ -133,12 +216,60 @@ class GCode:
             print(f"Error sending command {command}: {e}")
             return False
 
+    def _wait_in_flight(self, limit, timeout=30):
+        """Block until at most limit pipelined commands are unacknowledged; False on timeout."""
+        with self._ack_cond:
+            return self._ack_cond.wait_for(lambda: self._in_flight <= limit or not self.connected, timeout)
+
+    def drain(self, timeout=30):
+        """Block until every command sent with send_gcode_nowait has been acknowledged; False on timeout."""
+        return self._wait_in_flight(0, timeout)
+
+    def send_gcode_nowait(self, command):
+        """Send a G-code command (str or bytes) without waiting for its 'ok'; blocks only while PLANNER_DEPTH are unacknowledged."""
+        return self.send_gcode_bytes(self._as_line(command))
+
+    def send_gcode_bytes(self, line, position=None):
+        """Like send_gcode_nowait, for a line already encoded with its newline (see prepare_path_commands).
+
+        If the line is a move, pass its (x, y, z) as position to update the tracked position.
+        """
+        if not self.printer_on_serial:
+            print("No printer connected.")
+            return False
+        if not self._wait_in_flight(self.PLANNER_DEPTH - 1):
+            print(f"Timed out waiting for room to send {line.decode().strip()}")
+            return False
+        try:
+            with self._ack_cond:
+                self._in_flight += 1
+            self.printer_on_serial.write(line)
+        except Exception as e:
+            with self._ack_cond:
+                self._in_flight -= 1
+            print(f"Error sending command {line.decode().strip()}: {e}")
+            return False
+        if position is not None:
+            x, y, z = position
+            self.current_position['X'] = max(0, x)
+            self.current_position['Y'] = max(0, y)
+            self.current_position['Z'] = max(0, z)
+        return True
+
+    def prepare_path_commands(self, coords, feedrate=None):
+        """Encode the G1 line for each (x, y, z) in coords once, ready for send_gcode_bytes.
+
+        Z is left out of a line when it equals the previous point's, so level stretches of a
+        plate never command the Z axis. Uses the current feedrate unless one is given.
+        """
+        return encode_path_moves(coords, self.feedrate if feedrate is None else feedrate)
+
     def move_xyz(self, x, y, z):
         """Move the XYZ axes to the provided coordinates, ensuring no negative values."""
         x = max(0, x)  # Prevent negative X
         y = max(0, y)  # Prevent negative Y
         z = max(0, z)  # Prevent negative Z
-        command = f"G1 X{x} Y{y} Z{z} F{self.feedrate}"  # Append feedrate to movement command
+        command = b"G1 X%.3f Y%.3f Z%.3f F%g\n" % (x, y, z, self.feedrate)  # Append feedrate to movement command
         self.send_gcode(command)
 
         # Update current position after movement
@@ -146,6 +277,25 @@ class GCode:
         self.current_position['Y'] = y
         self.current_position['Z'] = z
 
+    def move_xyz_async(self, x, y, z):
+        """Queue a move to the given coordinates without waiting for it; use wait_for_moves() to sync."""
+        x = max(0, x)
+        y = max(0, y)
+        z = max(0, z)
+        self.send_gcode_bytes(b"G1 X%.3f Y%.3f Z%.3f F%g\n" % (x, y, z, self.feedrate))
+        self.current_position['X'] = x
+        self.current_position['Y'] = y
+        self.current_position['Z'] = z
+
+    def get_position(self):
+        """Return the tracked (X, Y, Z) position as one snapshot."""
+        pos = self.current_position
+        return pos['X'], pos['Y'], pos['Z']
+
+    def wait_for_moves(self):
+        """Block until all queued moves have finished (M400 is acknowledged once the planner is empty)."""
+        return self.send_gcode("M400")
+
     def home_all_axes(self):
         """Home all axes and reset current positions to 0."""
         if self.send_gcode("G28"):  # If homing is successful
@@ -153,7 +303,7 @@ class GCode:
             self.current_position = {'X': 0, 'Y': 0, 'Z': 0}
             
             # Add move to 0,0,0 after successful homing
-            self.send_gcode(f"G1 X0 Y0 Z0 F{self.feedrate}")
+            self.send_gcode_nowait(f"G1 X0 Y0 Z0 F{self.feedrate}")
             print("Moved to home position (0,0,0).")
         else:
             print("Homing failed or timed out.")
@@ -166,28 +316,32 @@ class GCode:
         """Set the maximum acceleration."""
         self.acceleration = acceleration
         command = f"M201 X{acceleration} Y{acceleration} Z{acceleration} E{acceleration}"
-        self.send_gcode(command)
+        self.send_gcode_nowait(command)
 
     def set_jerk(self, jerk):
         """Set the jerk (speed change rate)."""
         self.jerk = jerk
         command = f"M205 X{jerk} Y{jerk} Z{jerk}"
-        self.send_gcode(command)
+        self.send_gcode_nowait(command)
 
     def enable_steppers(self):
         """Enable steppers."""
-        self.send_gcode("M17")
+        self.send_gcode_nowait("M17")
 
     def disable_steppers(self):
         """Disable steppers."""
-        self.send_gcode("M84")
+        self.send_gcode_nowait("M84")
 
     def close_connection(self):
         """Close the serial connection and stop the listener thread."""
         if self.printer_on_serial:
             print("Closing serial connection...")
+            self.drain(timeout=5)  # Let windowed commands (e.g. M84 on close) be acknowledged
             self.connected = False
-            # Give the listener thread time to exit
-            time.sleep(0.5)
+            # The listener rechecks the stop event at least every read timeout (0.1 s); wait for
+            # it to leave read() before closing the port under it
+            self._stop.set()
+            if self.listener_thread:
+                self.listener_thread.join(timeout=1.0)
             self.printer_on_serial.close()
             self.printer_on_serial = None
@@ -0,0 +1,22 @@
+"""
+G-code line encoding shared by GCode and MockGCode
+"""
+
+Z_EPSILON = 1e-3  # mm; a Z change smaller than this is treated as no change
+
+def encode_path_moves(coords, feedrate):
+    """Encode the G1 line for each (x, y, z) in coords, as bytes ending in a newline.
+
+    Negative coordinates are clamped to 0. Z is left out of a line when it equals the
+    previous point's, so level stretches of a plate never command the Z axis.
+    """
+    lines = []
+    prev_z = None
+    for x, y, z in coords:
+        x, y, z = max(0, x), max(0, y), max(0, z)  # Prevent negative coordinates
+        if prev_z is not None and abs(z - prev_z) < Z_EPSILON:
+            lines.append(b"G1 X%.3f Y%.3f F%g\n" % (x, y, feedrate))
+        else:
+            lines.append(b"G1 X%.3f Y%.3f Z%.3f F%g\n" % (x, y, z, feedrate))
+        prev_z = z
+    return lines
@@ -3,12 +3,14 @@ Simplified GCode implementation using mock hardware for testing
 """
 import threading
 import time
+from .gcode_lines import encode_path_moves
 from .mock_hardware import MockSerial, MockPrinter
 
 class MockGCode:
-    def __init__(self, baudrate=250000, feedrate=2000, acceleration=5, jerk=1):
-        """Initialize the Mock GCode class with simulated hardware"""
+    def __init__(self, baudrate=250000, feedrate=2000, acceleration=5, jerk=1, sim_latency=0.0):
+        """Initialize the Mock GCode class with simulated hardware (sim_latency=0.1 mimics a real printer's pace)"""
         self.baud_rate = baudrate
+        self.sim_latency = sim_latency
         self.printer_on_serial = None
         self.listener_thread = None
         self.connected = False
@@ -19,6 +21,7 @@ class MockGCode:
         self.waiting_for_response = False
         self.last_response = None
         self.mock_printer = MockPrinter()
+        self._rx_buf = bytearray()  # Received bytes not yet ending in a newline
         self.connect_to_printer()
 
     def find_serial_port(self):
@@ -28,7 +31,7 @@ class MockGCode:
     def connect_to_printer(self):
         """Establish connection to the mock printer"""
         try:
-            self.printer_on_serial = MockSerial("COM_MOCK", self.baud_rate, timeout=1)
+            self.printer_on_serial = MockSerial("COM_MOCK", self.baud_rate, timeout=1, sim_latency=self.sim_latency)
             self.connected = True
             print(f"Connected to mock printer on COM_MOCK at {self.baud_rate} baud")
             
@@ -50,16 +53,23 @@ class MockGCode:
     def listen_to_printer_output(self):
         """Listen for data from the mock printer"""
         while self.connected:
-            if self.printer_on_serial and self.printer_on_serial.in_waiting > 0:
-                response = self.printer_on_serial.readline().decode('utf-8').strip()
-                if self.waiting_for_response:
-                    self.last_response = response
-                else:
-                    print(f"Printer: {response}")
+            ser = self.printer_on_serial
+            waiting = ser.in_waiting if ser else 0
+            if waiting:
+                self._rx_buf += ser.read(waiting)
+                while b'\n' in self._rx_buf:
+                    line, _, self._rx_buf = self._rx_buf.partition(b'\n')
+                    response = line.decode('utf-8').strip()
+                    if self.waiting_for_response:
+                        self.last_response = response
+                    else:
+                        print(f"Printer: {response}")
             time.sleep(0.01)
 
     def send_gcode(self, command):
-        """Send a G-code command to the mock printer"""
+        """Send a G-code command (str, or bytes as from prepare_path_commands) to the mock printer"""
+        if isinstance(command, bytes):
+            command = command.decode('utf-8').strip()
         if not self.printer_on_serial:
             print("No printer connected")
             return False
@@ -87,6 +97,22 @@ class MockGCode:
             print(f"Error sending command {command}: {e}")
             return False
 
+    def drain(self, timeout=30):
+        """Nothing is ever in flight: the mock printer handles each command as it is sent"""
+        return True
+
+    def send_gcode_nowait(self, command):
+        """Send a G-code command; the mock has no planner window, so this is send_gcode"""
+        return self.send_gcode(command)
+
+    def send_gcode_bytes(self, line, position=None):
+        """Send a line encoded by prepare_path_commands (position is tracked from the mock printer)"""
+        return self.send_gcode(line)
+
+    def prepare_path_commands(self, coords, feedrate=None):
+        """Encode the G1 line for each (x, y, z) in coords, exactly as GCode does"""
+        return encode_path_moves(coords, self.feedrate if feedrate is None else feedrate)
+
     def move_xyz(self, x, y, z):
         """Move the XYZ axes to the provided coordinates"""
         x = max(0, x)  # Prevent negative X
@@ -95,6 +121,19 @@ class MockGCode:
         command = f"G1 X{x} Y{y} Z{z} F{self.feedrate}"
         self.send_gcode(command)
 
+    def move_xyz_async(self, x, y, z):
+        """Queue a move; the mock finishes it immediately"""
+        self.move_xyz(x, y, z)
+
+    def get_position(self):
+        """Return the tracked (X, Y, Z) position as one snapshot"""
+        pos = self.current_position
+        return pos['X'], pos['Y'], pos['Z']
+
+    def wait_for_moves(self):
+        """Block until all queued moves have finished"""
+        return self.send_gcode("M400")
+
     def home_all_axes(self):
         """Home all axes"""
         if self.send_gcode("G28"):
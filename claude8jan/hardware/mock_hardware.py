@@ -1,42 +1,55 @@
 """
 Simplified mock hardware implementations for testing without external dependencies
 """
+import collections
+import re
 import time
 import threading
 
+_OK = "ok"
+_AXIS_RE = re.compile(r'([XYZ])(-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?)')  # Axis words of a move, e.g. X12.5
+
 class MockSerial:
     """Mock serial connection that prints GCode commands to console"""
-    def __init__(self, port=None, baudrate=None, timeout=None):
+    def __init__(self, port=None, baudrate=None, timeout=None, sim_latency=0.0):
+        """sim_latency: seconds each command takes to answer (homing takes 5x); 0 answers at once"""
         self.is_open = True
-        self.in_waiting = 0
-        self._response_queue = []
+        self.sim_latency = sim_latency
+        self.in_waiting = 0  # Bytes of queued responses, as on a real port
+        self._response_queue = collections.deque()
         print(f"Mock Serial initialized (port={port}, baudrate={baudrate})")
         
     def write(self, data):
         """Print the GCode command to console"""
         command = data.decode('utf-8').strip()
         print(f"Mock Serial received: {command}")
-        # Simulate printer response
-        if command.startswith('G28'):
+        # Simulate printer response time, only when asked to
+        if self.sim_latency:
             # Homing takes longer
-            time.sleep(0.5)
-        else:
-            time.sleep(0.1)
+            time.sleep(self.sim_latency * 5 if command.startswith('G28') else self.sim_latency)
         self._response_queue.append("ok")
-        self.in_waiting = 1
+        self.in_waiting += len("ok\n")
         return len(data)
         
+    def read(self, size=1):
+        """Return whole queued response lines, up to size bytes"""
+        data = bytearray()
+        while self._response_queue and len(data) + len(self._response_queue[0]) + 1 <= size:
+            data += self._response_queue.popleft().encode('utf-8') + b'\n'
+        self.in_waiting -= len(data)
+        return bytes(data)
+        
     def readline(self):
         """Return simulated response"""
         if self._response_queue:
-            response = self._response_queue.pop(0)
-            self.in_waiting = len(self._response_queue)
-            return response.encode('utf-8') + b'\n'
+            line = self._response_queue.popleft().encode('utf-8') + b'\n'
+            self.in_waiting -= len(line)
+            return line
         return b''
         
     def reset_input_buffer(self):
         """Clear input buffer"""
-        self._response_queue = []
+        self._response_queue.clear()
         self.in_waiting = 0
         
     def close(self):
@@ -50,27 +63,35 @@ class MockPrinter:
         self.position = {'X': 0, 'Y': 0, 'Z': 0}
         self.is_homed = False
         self.steppers_enabled = True
+        # Handlers keyed on the first three characters of the command
+        self._cmd_table = {
+            'G28': self._home,
+            'G1 ': self._move,
+            'M84': self._disable,  # Disable steppers
+            'M17': self._enable,  # Enable steppers
+        }
         
     def process_command(self, command):
         """Process a GCode command and return appropriate response"""
-        if command.startswith('G28'):
-            self.position = {'X': 0, 'Y': 0, 'Z': 0}
-            self.is_homed = True
-            return "ok"
-        elif command.startswith('G1'):
-            # Parse movement command
-            parts = command.split()
-            for part in parts[1:]:  # Skip G1
-                if part[0] in ['X', 'Y', 'Z']:
-                    self.position[part[0]] = float(part[1:])
-            return "ok"
-        elif command.startswith('M84'):  # Disable steppers
-            self.steppers_enabled = False
-            return "ok"
-        elif command.startswith('M17'):  # Enable steppers
-            self.steppers_enabled = True
-            return "ok"
-        return "ok"
+        handler = self._cmd_table.get(command[:3])
+        if handler:
+            handler(command)
+        return _OK
+
+    def _home(self, command):
+        self.position = {'X': 0, 'Y': 0, 'Z': 0}
+        self.is_homed = True
+
+    def _move(self, command):
+        # Every axis word in one scan; F and anything else is ignored
+        for axis, value in _AXIS_RE.findall(command):
+            self.position[axis] = float(value)
+
+    def _disable(self, command):
+        self.steppers_enabled = False
+
+    def _enable(self, command):
+        self.steppers_enabled = True
 
 class MockCamera:
     """Simple mock camera that just logs operations"""
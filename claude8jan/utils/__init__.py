@@ -5,6 +5,8 @@ Contains helper functions for path generation and data processing.
 """
 
 from .path_generator import (
+    WELL_NAMES,
+    path_to_array,
     generate_well_plate_path,
     calculate_travel_time,
     validate_corner_positions,
@@ -12,6 +14,8 @@ from .path_generator import (
 )
 
 __all__ = [
+    'WELL_NAMES',
+    'path_to_array',
     'generate_well_plate_path',
     'calculate_travel_time',
     'validate_corner_positions',
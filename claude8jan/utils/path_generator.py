@@ -1,80 +1,89 @@
 """
 Utility functions for generating well plate scanning paths
 """
+import numpy as np
+
+# Well names of the 6x8 plate in path order: A1..A8, B1..B8, ..., F1..F8
+WELL_NAMES = tuple(f"{chr(65 + i // 8)}{i % 8 + 1}" for i in range(6 * 8))
+
+# The same names as ASCII codes, ready to copy onto a preview canvas
+_WELL_LABEL_CODES = tuple(np.frombuffer(name.encode('ascii'), dtype=np.uint8) for name in WELL_NAMES)
+
+def path_to_array(path):
+    """
+    Convert a path to an (N, 3) array of X, Y, Z rows.
+    
+    Args:
+        path (list): Positions as dicts with X, Y, Z keys, or as [x, y, z] rows
+        
+    Returns:
+        numpy.ndarray: float64 array of shape (N, 3)
+    """
+    if len(path) and isinstance(path[0], dict):
+        path = [(p['X'], p['Y'], p['Z']) for p in path]
+    return np.asarray(path, dtype=np.float64).reshape(-1, 3)
+
+def _corners_to_ndarray(A1, A8, F8, F1):
+    """Stack the four corner positions (dicts or [x, y, z]) into one (4, 3) array, in A1, A8, F8, F1 order."""
+    return path_to_array([A1, A8, F8, F1])
 
 def interpolate_position(pos1, pos2, fraction):
     """
     Interpolate between two positions.
     
     Args:
-        pos1 (dict): Starting position with X, Y, Z coordinates
-        pos2 (dict): Ending position with X, Y, Z coordinates
-        fraction (float): Fraction of distance (0.0 to 1.0)
+        pos1 (numpy.ndarray): Starting X, Y, Z position(s)
+        pos2 (numpy.ndarray): Ending X, Y, Z position(s)
+        fraction (float or numpy.ndarray): Fraction of distance (0.0 to 1.0), broadcast against the positions
         
     Returns:
-        dict: Interpolated position with X, Y, Z coordinates
+        numpy.ndarray: Interpolated X, Y, Z position(s)
     """
-    return {
-        'X': pos1['X'] + (pos2['X'] - pos1['X']) * fraction,
-        'Y': pos1['Y'] + (pos2['Y'] - pos1['Y']) * fraction,
-        'Z': pos1['Z'] + (pos2['Z'] - pos1['Z']) * fraction
-    }
+    return pos1 + (pos2 - pos1) * fraction
 
 def generate_well_plate_path(A1, A8, F8, F1):
     """
     Generate a path for scanning a 6x8 well plate given the corner positions.
     
     Args:
-        A1 (dict): Position of well A1 (top-left)
-        A8 (dict): Position of well A8 (top-right)
-        F8 (dict): Position of well F8 (bottom-right)
-        F1 (dict): Position of well F1 (bottom-left)
+        A1 (dict or sequence): Position of well A1 (top-left), as an X/Y/Z dict or [x, y, z]
+        A8 (dict or sequence): Position of well A8 (top-right)
+        F8 (dict or sequence): Position of well F8 (bottom-right)
+        F1 (dict or sequence): Position of well F1 (bottom-left)
         
     Returns:
-        list: List of positions for each well in sequence
+        numpy.ndarray: (48, 3) array of X, Y, Z rows for each well in sequence
     """
-    path = []
     num_rows = 6  # A to F
     num_cols = 8  # 1 to 8
+    A1, A8, F8, F1 = _corners_to_ndarray(A1, A8, F8, F1)
     
-    for row in range(num_rows):
-        # Calculate the start and end points for this row
-        row_fraction = row / (num_rows - 1)
-        row_start = interpolate_position(A1, F1, row_fraction)
-        row_end = interpolate_position(A8, F8, row_fraction)
-        
-        # Generate positions for each well in the row
-        for col in range(num_cols):
-            col_fraction = col / (num_cols - 1)
-            position = interpolate_position(row_start, row_end, col_fraction)
-            path.append(position)
+    # Start and end point of every row at once, shape (rows, 3)
+    row_fraction = np.linspace(0, 1, num_rows)[:, None]
+    row_start = interpolate_position(A1, F1, row_fraction)
+    row_end = interpolate_position(A8, F8, row_fraction)
+    
+    # Every well along every row, shape (rows, cols, 3), flattened to path order
+    col_fraction = np.linspace(0, 1, num_cols)[None, :, None]
+    points = interpolate_position(row_start[:, None, :], row_end[:, None, :], col_fraction)
     
-    return path
+    return points.reshape(-1, 3)
 
 def calculate_travel_time(path, feedrate):
     """
     Calculate the total travel time for a given path.
     
     Args:
-        path (list): List of positions
+        path (numpy.ndarray or list): (N, 3) array of X, Y, Z rows, or a list of X/Y/Z dicts
         feedrate (float): Movement speed in mm/min
         
     Returns:
         float: Estimated travel time in minutes
     """
-    total_distance = 0
-    for i in range(1, len(path)):
-        prev_pos = path[i-1]
-        curr_pos = path[i]
-        
-        # Calculate Euclidean distance
-        distance = (
-            (curr_pos['X'] - prev_pos['X'])**2 +
-            (curr_pos['Y'] - prev_pos['Y'])**2 +
-            (curr_pos['Z'] - prev_pos['Z'])**2
-        )**0.5
-        
-        total_distance += distance
+    coords = path_to_array(path)  # No copy when path is already a float64 array
+    
+    # Euclidean length of every step, summed in one pass
+    total_distance = float(np.linalg.norm(np.diff(coords, axis=0), axis=1).sum())
     
     return total_distance / feedrate
 
@@ -83,18 +92,20 @@ def validate_corner_positions(A1, A8, F8, F1):
     Validate that the corner positions form a reasonable rectangle.
     
     Args:
-        A1 (dict): Position of well A1
-        A8 (dict): Position of well A8
-        F8 (dict): Position of well F8
-        F1 (dict): Position of well F1
+        A1 (dict or sequence): Position of well A1, as an X/Y/Z dict or [x, y, z]
+        A8 (dict or sequence): Position of well A8
+        F8 (dict or sequence): Position of well F8
+        F1 (dict or sequence): Position of well F1
         
     Returns:
         bool: True if positions are valid, False otherwise
     """
-    # Check that all positions are provided and have X, Y, Z coordinates
-    corners = [A1, A8, F8, F1]
-    if not all(isinstance(pos, dict) and all(k in pos for k in ['X', 'Y', 'Z']) 
-              for pos in corners):
+    # Check that all positions are provided and have finite X, Y, Z coordinates
+    try:
+        corners = _corners_to_ndarray(A1, A8, F8, F1)
+    except (KeyError, TypeError, ValueError):
+        return False
+    if corners.shape != (4, 3) or not np.isfinite(corners).all():
         return False
     
     # Check that the rectangle is not too skewed
@@ -106,40 +117,34 @@ def generate_preview(path, width=600, height=400):
     Generate a text-based preview of the path.
     
     Args:
-        path (list): List of positions
+        path (numpy.ndarray or list): (N, 3) array of X, Y, Z rows, or a list of X/Y/Z dicts
         width (int): Width of preview in characters
         height (int): Height of preview in characters
         
     Returns:
         str: ASCII art preview of the path
     """
+    path = path_to_array(path)  # No copy when path is already a float64 array
+    
     # Find the bounds of the path
-    min_x = min(p['X'] for p in path)
-    max_x = max(p['X'] for p in path)
-    min_y = min(p['Y'] for p in path)
-    max_y = max(p['Y'] for p in path)
-    
-    # Create a blank canvas
-    canvas = [[' ' for _ in range(width)] for _ in range(height)]
-    
-    # Plot each point
-    for i, pos in enumerate(path):
-        # Scale coordinates to canvas size
-        x = int((pos['X'] - min_x) / (max_x - min_x) * (width - 1))
-        y = int((pos['Y'] - min_y) / (max_y - min_y) * (height - 1))
-        
-        # Mark the point
-        canvas[y][x] = 'O'
-        
-        # Add well label
-        row = chr(65 + (i // 8))
-        col = (i % 8) + 1
-        label = f"{row}{col}"
-        
-        # Try to place label next to point
+    min_x, min_y = path[:, :2].min(axis=0)
+    max_x, max_y = path[:, :2].max(axis=0)
+    
+    # Scale all coordinates to canvas size at once
+    xs = ((path[:, 0] - min_x) / (max_x - min_x) * (width - 1)).astype(np.intp)
+    ys = ((path[:, 1] - min_y) / (max_y - min_y) * (height - 1)).astype(np.intp)
+    
+    # Blank canvas of ASCII codes, with a final column of newlines so it reads out as one string
+    canvas = np.full((height, width + 1), ord(' '), dtype=np.uint8)
+    canvas[:, -1] = ord('\n')
+    
+    # Place each well label next to its point where it fits
+    for x, y, label in zip(xs.tolist(), ys.tolist(), _WELL_LABEL_CODES[:len(path)]):
         if x + len(label) < width:
-            for j, char in enumerate(label):
-                canvas[y][x+1+j] = char
+            canvas[y, x + 1:x + 1 + len(label)] = label
+    
+    # Mark all the points in one scatter, after the labels so none is hidden
+    canvas[ys, xs] = ord('O')
     
-    # Convert canvas to string
-    return '\n'.join(''.join(row) for row in canvas)
\ No newline at end of file
+    # Convert canvas to string (dropping the trailing newline)
+    return canvas.tobytes()[:-1].decode('ascii')
@@ -7,6 +7,7 @@ All settings for GUI, hardware, and experiments are centralized here.
 CAMERA_SETTINGS = {
     'WIDTH': 640,
     'HEIGHT': 480,
+    'TARGET_FPS': 30,       # Preview refresh rate, matched to the camera's frame rate
     'ROTATION': 0,
     'ZOOM': 1.0,
     'DEFAULT_OVERLAY_COLOR': 'red',
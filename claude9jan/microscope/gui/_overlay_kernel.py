@@ -0,0 +1,19 @@
+"""
+Overlay compositing kernel, compiled ahead of time with Pythran (see requirements.txt):
+
+    pythran -O3 -march=native -fopenmp microscope/gui/_overlay_kernel.py -o microscope/gui/_overlay_kernel.so
+
+CameraGUI only uses the compiled extension; this source is never run as plain
+Python, where the pixel loop would be far slower than the Numba/NumPy paths.
+"""
+
+#pythran export composite(uint8[:,:,:], bool[:,:], uint8[:])
+def composite(frame, mask, color):
+    """Paint color into every pixel of frame where mask is set."""
+    channels = color.shape[0]
+    #omp parallel for
+    for y in range(frame.shape[0]):
+        for x in range(frame.shape[1]):
+            if mask[y, x]:
+                for c in range(channels):
+                    frame[y, x, c] = color[c]
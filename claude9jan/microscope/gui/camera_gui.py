@@ -9,22 +9,95 @@ import cv2
 import numpy as np
 from PIL import Image, ImageTk
 import logging
+import threading
+import time
+from dataclasses import dataclass
 from typing import Optional, Dict, Any
 
 from ..config import CAMERA_SETTINGS
 from ..hardware.camera import Camera
 
+try:
+    from . import _overlay_kernel
+except ImportError:
+    _overlay_kernel = None
+
+try:
+    from numba import njit, prange
+except ImportError:  # Optional: JIT-compiled overlay compositing
+    njit = None
+
+_composite = None  # Compiled overlay kernel once one is ready; NumPy's masked store until then
+_numba_warmup = None  # Thread compiling the Numba kernel
+
+if _overlay_kernel is not None and not _overlay_kernel.__file__.endswith('.py'):
+    # Pythran-built extension (it takes precedence over the .py source on import)
+    _composite = _overlay_kernel.composite
+elif njit is not None:
+    @njit(parallel=True, nogil=True, cache=True)
+    def _numba_composite(frame, mask, color):
+        """Paint color into every pixel of frame where mask is set, rows split across threads."""
+        for y in prange(frame.shape[0]):
+            for x in range(frame.shape[1]):
+                if mask[y, x]:
+                    for c in range(color.shape[0]):
+                        frame[y, x, c] = color[c]
+
+
+def _start_numba_warmup():
+    """Compile the Numba kernel on a background thread; it can take seconds on a Pi with a cold cache."""
+    global _numba_warmup
+    if _composite is not None or njit is None or _numba_warmup is not None:
+        return
+    
+    def warm_up():
+        global _composite
+        try:
+            _numba_composite(np.zeros((1, 1, 3), np.uint8), np.ones((1, 1), np.bool_), np.zeros(3, np.uint8))
+        except Exception as e:
+            logging.getLogger(__name__).warning(f"Numba overlay kernel unavailable: {e}")
+            return
+        _composite = _numba_composite
+    
+    _numba_warmup = threading.Thread(target=warm_up, daemon=True)
+    _numba_warmup.start()
+
+# Overlay color names to BGR
+_COLOR_MAP = {
+    "red": (0, 0, 255),
+    "green": (0, 255, 0),
+    "blue": (255, 0, 0),
+    "yellow": (0, 255, 255),
+    "white": (255, 255, 255)
+}
+
+@dataclass(frozen=True)
+class OverlayState:
+    """Snapshot of the overlay settings; a new instance replaces the old one on every change."""
+    crosshair: bool
+    circle: bool
+    color: tuple  # BGR
+    size: int
+    thickness: int
+
 class CameraGUI:
     """GUI class for camera preview and control."""
     
     def __init__(self, root: tk.Toplevel, camera: Camera):
         self.logger = logging.getLogger(__name__)
+        _start_numba_warmup()
         self.root = root
         self.root.title("Camera Preview")
         self.root.geometry(CAMERA_SETTINGS['DEFAULT_WINDOW_SIZE'])
         self.camera = camera
         self.running = False
         self.preview_size = (640, 480)
+        self._frame_interval_ms = 1000 / CAMERA_SETTINGS['TARGET_FPS']
+        self._warp_buf = None  # Output of the rotate/zoom warp, reused while the frame shape holds
+        self._affine = None  # ((angle, zoom, rows, cols), 2x3 warp matrix), cleared when rotation/zoom change
+        self._ds_buf = None  # Output of the downscale for frames larger than preview_size
+        self._use_opencl = cv2.ocl.haveOpenCL()  # Run the capture pipeline on UMats (T-API)
+        self._mask_umat = None  # (overlay cache, UMat of its mask) for the OpenCL path
         self.rotation = tk.IntVar(value=CAMERA_SETTINGS['ROTATION'])
         self.zoom = tk.DoubleVar(value=CAMERA_SETTINGS['ZOOM'])
         self.crosshair_enabled = tk.BooleanVar(value=False)
@@ -32,6 +105,20 @@ class CameraGUI:
         self.overlay_color = tk.StringVar(value=CAMERA_SETTINGS['DEFAULT_OVERLAY_COLOR'])
         self.overlay_size = tk.IntVar(value=CAMERA_SETTINGS['DEFAULT_CIRCLE_SIZE'])
         self.overlay_thickness = tk.IntVar(value=CAMERA_SETTINGS['DEFAULT_OVERLAY_THICKNESS'])
+        self._overlay_cache = None  # (OverlayState, frame shape, boolean mask, color) of the drawn overlay
+        # The capture thread only reads plain snapshots of the Tk variables, refreshed by traces
+        self._refresh_transform()
+        self._refresh_overlay_state()
+        for var in (self.rotation, self.zoom):
+            var.trace_add('write', self._refresh_transform)
+        for var in (self.crosshair_enabled, self.circle_enabled, self.overlay_color,
+                    self.overlay_size, self.overlay_thickness):
+            var.trace_add('write', self._refresh_overlay_state)
+        # Double buffer of finished RGB frames: [front (shown by Tk), back (filled by the capture thread)]
+        self._frame_bufs = [None, None]
+        self._swap_lock = threading.Lock()
+        self._frame_ready = threading.Event()
+        self._capture_error = None  # Set by the capture thread, reported on the Tk thread
         self.create_gui()
         self.initialize_camera()
 
@@ -42,6 +129,7 @@ class CameraGUI:
                 self.camera = Camera()
             self.running = True
             self.logger.info("Camera initialized successfully")
+            threading.Thread(target=self._capture_loop, daemon=True).start()
             self.update_preview()
         except Exception as e:
             self.logger.error(f"Error initializing camera: {e}")
@@ -59,6 +147,7 @@ class CameraGUI:
         # Create preview label
         self.preview_label = ttk.Label(self.preview_frame)
         self.preview_label.pack(expand=True)
+        self._allocate_preview(*self.preview_size)
         
         # Create control panels
         self.create_camera_controls()
@@ -153,40 +242,138 @@ class CameraGUI:
         )
         thickness_scale.pack(fill=tk.X)
         
-    def update_preview(self):
-        """Update the preview image."""
-        if self.running and self.camera:
+    def _capture_loop(self):
+        """Capture thread: grab, transform and convert frames into the back buffer, then swap."""
+        camera = self.camera
+        while self.running:
             try:
-                # Capture frame
-                frame = self.camera.capture_frame()
-                if frame is not None:
-                    # Apply camera transformations
-                    frame = self.apply_camera_transformations(frame)
-                    
-                    # Draw overlays
-                    frame = self.draw_overlays(frame)
-                    
-                    # Convert to PhotoImage
-                    image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                    image = Image.fromarray(image)
-                    photo = ImageTk.PhotoImage(image)
-                    
-                    # Update preview
-                    self.preview_label.configure(image=photo)
-                    self.preview_label.image = photo
+                frame = camera.capture_latest()
+                if frame is None:
+                    continue
+                
+                if self._use_opencl:
+                    # Whole pipeline on the GPU; the downloaded array becomes the back buffer as is
+                    back = self._process_opencl(frame)
+                    with self._swap_lock:
+                        self._frame_bufs[0], self._frame_bufs[1] = back, self._frame_bufs[0]
+                    self._frame_ready.set()
+                    continue
+                
+                # Shrink oversized frames first so every later stage works at preview size
+                frame = self.fit_to_preview(frame)
+                
+                # Apply camera transformations
+                frame = self.apply_camera_transformations(frame)
                 
-                # Schedule next update
-                self.root.after(10, self.update_preview)
-                    
+                # Draw overlays
+                frame = self.draw_overlays(frame)
+                
+                # Convert into the back buffer, then make it the front one
+                height, width = frame.shape[:2]
+                back = self._frame_bufs[1]
+                if back is None or back.shape[:2] != (height, width):
+                    back = np.empty((height, width, 3), np.uint8)
+                cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=back)
+                with self._swap_lock:
+                    self._frame_bufs[0], self._frame_bufs[1] = back, self._frame_bufs[0]
+                self._frame_ready.set()
             except Exception as e:
-                self.logger.error(f"Error updating preview: {e}")
+                self._capture_error = e
                 self.running = False
-                self.show_error("Preview error")
+        
+    def _process_opencl(self, frame: np.ndarray) -> np.ndarray:
+        """
+        Downscale, rotate/zoom, draw overlays and convert a frame to RGB on UMats.
+        
+        Args:
+            frame: Input frame
+            
+        Returns:
+            RGB frame, downloaded from the device once at the end
+        """
+        umat = cv2.UMat(frame)
+        rows, cols = frame.shape[:2]
+        size = self._preview_fit_size(rows, cols)
+        if size is not None:
+            umat = cv2.resize(umat, size, interpolation=cv2.INTER_AREA)
+            cols, rows = size
+        
+        angle = self._angle
+        zoom = self._zoom
+        if angle != 0 or zoom != 1.0:
+            matrix = self._affine_matrix(angle, zoom, rows, cols)
+            umat = cv2.warpAffine(umat, matrix, (cols, rows), flags=cv2.INTER_LINEAR)
+        
+        cache = self._get_overlay((rows, cols) + frame.shape[2:])
+        _, _, mask, color = cache
+        if mask is not None:
+            if self._mask_umat is None or self._mask_umat[0] is not cache:
+                self._mask_umat = (cache, cv2.UMat(mask.view(np.uint8)))  # Upload once per overlay change
+            umat.setTo(tuple(color.tolist()), mask=self._mask_umat[1])
+        
+        return cv2.cvtColor(umat, cv2.COLOR_BGR2RGB).get()
+        
+    def update_preview(self):
+        """Paste the newest finished frame into the preview (Tk thread)."""
+        if self._capture_error is not None:
+            self.logger.error(f"Error updating preview: {self._capture_error}")
+            self._capture_error = None
+            self.show_error("Preview error")
+            return
+        if not self.running:
+            return
+        
+        start = time.perf_counter()
+        if self._frame_ready.is_set():
+            self._frame_ready.clear()
+            # The capture thread can't swap buffers while the front one is being pasted
+            with self._swap_lock:
+                front = self._frame_bufs[0]
+                height, width = front.shape[:2]
+                if (self._photo.width(), self._photo.height()) != (width, height):
+                    self._allocate_preview(width, height)
+                self._photo.paste(Image.frombuffer('RGB', (width, height), front, 'raw', 'RGB', 0, 1))
+        
+        # Schedule the next update one camera frame after this one started
+        process_ms = (time.perf_counter() - start) * 1000
+        self.root.after(max(1, int(self._frame_interval_ms - process_ms)), self.update_preview)
+                
+    def _allocate_preview(self, width: int, height: int):
+        """Create the PhotoImage that every preview frame is pasted into."""
+        self._photo = ImageTk.PhotoImage(image=Image.new('RGB', (width, height)))
+        self.preview_label.configure(image=self._photo)
                 
     def stop_preview(self):
         """Stop the camera preview."""
         self.running = False
                 
+    def fit_to_preview(self, frame: np.ndarray) -> np.ndarray:
+        """
+        Downscale a frame larger than the preview size, keeping its aspect ratio.
+        
+        Args:
+            frame: Input frame
+            
+        Returns:
+            The frame itself if it already fits, else an area-averaged copy in a reused buffer
+        """
+        size = self._preview_fit_size(*frame.shape[:2])
+        if size is None:
+            return frame
+        
+        shape = (size[1], size[0]) + frame.shape[2:]
+        if self._ds_buf is None or self._ds_buf.shape != shape:
+            self._ds_buf = np.empty(shape, frame.dtype)
+        return cv2.resize(frame, size, dst=self._ds_buf, interpolation=cv2.INTER_AREA)
+                
+    def _preview_fit_size(self, rows: int, cols: int) -> Optional[tuple]:
+        """(width, height) to downscale a rows x cols frame to, or None if it already fits."""
+        max_cols, max_rows = self.preview_size
+        if cols <= max_cols and rows <= max_rows:
+            return None
+        scale = min(max_cols / cols, max_rows / rows)
+        return max(1, round(cols * scale)), max(1, round(rows * scale))
+                
     def apply_camera_transformations(self, frame: np.ndarray) -> np.ndarray:
         """
         Apply rotation and zoom transformations to the frame.
@@ -197,23 +384,36 @@ class CameraGUI:
         Returns:
             Transformed frame
         """
-        # Apply rotation
-        if self.rotation.get() != 0:
-            rows, cols = frame.shape[:2]
-            matrix = cv2.getRotationMatrix2D((cols/2, rows/2), self.rotation.get(), 1)
-            frame = cv2.warpAffine(frame, matrix, (cols, rows))
-        
-        # Apply zoom
-        if self.zoom.get() != 1.0:
-            rows, cols = frame.shape[:2]
-            zoom = self.zoom.get()
-            crop_size = (int(cols/zoom), int(rows/zoom))
-            x = (cols - crop_size[0]) // 2
-            y = (rows - crop_size[1]) // 2
-            frame = frame[y:y+crop_size[1], x:x+crop_size[0]]
-            frame = cv2.resize(frame, (cols, rows))
-            
-        return frame
+        angle = self._angle
+        zoom = self._zoom
+        if angle == 0 and zoom == 1.0:
+            return frame
+
+        rows, cols = frame.shape[:2]
+        if self._warp_buf is None or self._warp_buf.shape != frame.shape:
+            self._warp_buf = np.empty_like(frame)
+
+        k = int(zoom)
+        if angle == 0 and zoom in (2.0, 4.0) and rows % k == 0 and cols % k == 0:
+            # Integer zoom: replicate each pixel of the center crop k x k times, a copy with no resampling
+            h, w = rows // k, cols // k
+            top, left = (rows - h) // 2, (cols - w) // 2
+            cropped = frame[top:top + h, left:left + w]
+            extra = frame.shape[2:]
+            self._warp_buf.reshape((h, k, w, k) + extra)[...] = cropped.reshape((h, 1, w, 1) + extra)
+            return self._warp_buf
+
+        # Rotation and zoom about the center as one affine warp, into a reused buffer
+        matrix = self._affine_matrix(angle, zoom, rows, cols)
+        return cv2.warpAffine(frame, matrix, (cols, rows), dst=self._warp_buf, flags=cv2.INTER_LINEAR)
+        
+    def _affine_matrix(self, angle: float, zoom: float, rows: int, cols: int) -> np.ndarray:
+        """Return the rotate/zoom-about-center matrix, rebuilt only when its inputs change."""
+        key = (angle, zoom, rows, cols)
+        affine = self._affine
+        if affine is None or affine[0] != key:
+            affine = self._affine = (key, cv2.getRotationMatrix2D((cols/2, rows/2), angle, zoom))
+        return affine[1]
         
     def draw_overlays(self, frame: np.ndarray) -> np.ndarray:
         """
@@ -225,32 +425,80 @@ class CameraGUI:
         Returns:
             Frame with overlays
         """
-        height, width = frame.shape[:2]
+        _, _, mask, color = self._get_overlay(frame.shape)
+        if mask is not None:
+            # The compiled kernels expect a contiguous HxWxC frame
+            if _composite is not None and frame.ndim == 3 and frame.flags.c_contiguous:
+                _composite(frame, mask, color)
+            else:
+                frame[mask] = color
+        
+        return frame
+        
+    def _get_overlay(self, shape: tuple) -> tuple:
+        """Return the cached overlay, rebuilding it if the settings or frame shape changed."""
+        state = self._state
+        cache = self._overlay_cache
+        if cache is None or cache[0] is not state or cache[1] != shape:
+            cache = self._overlay_cache = self._build_overlay(state, shape)
+        return cache
+        
+    def _build_overlay(self, state: OverlayState, shape: tuple) -> tuple:
+        """
+        Rasterize the enabled overlays once into a boolean mask of the pixels they cover.
+        
+        Args:
+            state: Overlay settings to draw
+            shape: Shape of the frames the overlay is applied to
+            
+        Returns:
+            (state, shape, mask or None if nothing is enabled, color for the frame's channels)
+        """
+        height, width = shape[:2]
         center_x = width // 2
         center_y = height // 2
+        thickness = state.thickness
         
-        # Convert color name to BGR
-        color_map = {
-            "red": (0, 0, 255),
-            "green": (0, 255, 0),
-            "blue": (255, 0, 0),
-            "yellow": (0, 255, 255),
-            "white": (255, 255, 255)
-        }
-        color = color_map[self.overlay_color.get()]
-        thickness = self.overlay_thickness.get()
+        mask = np.zeros((height, width), bool)
+        canvas = mask.view(np.uint8)  # cv2 draws into the same memory as 0/1 bytes
         
         # Draw crosshair
-        if self.crosshair_enabled.get():
-            cv2.line(frame, (0, center_y), (width, center_y), color, thickness)
-            cv2.line(frame, (center_x, 0), (center_x, height), color, thickness)
+        if state.crosshair:
+            cv2.line(canvas, (0, center_y), (width, center_y), 1, thickness)
+            cv2.line(canvas, (center_x, 0), (center_x, height), 1, thickness)
         
         # Draw circle
-        if self.circle_enabled.get():
-            radius = self.overlay_size.get() // 2
-            cv2.circle(frame, (center_x, center_y), radius, color, thickness)
+        if state.circle:
+            radius = state.size // 2
+            cv2.circle(canvas, (center_x, center_y), radius, 1, thickness)
         
-        return frame
+        if not mask.any():
+            mask = None
+        channels = shape[2] if len(shape) > 2 else 1
+        color = np.array((state.color + (255,) * channels)[:channels], np.uint8)  # Pad for XBGR frames
+        return state, shape, mask, color
+        
+    def _refresh_overlay_state(self, *args):
+        """Snapshot the overlay settings; the next frame sees a new state and rebuilds the overlay."""
+        try:
+            self._state = OverlayState(
+                crosshair=self.crosshair_enabled.get(),
+                circle=self.circle_enabled.get(),
+                color=_COLOR_MAP[self.overlay_color.get()],
+                size=self.overlay_size.get(),
+                thickness=self.overlay_thickness.get()
+            )
+        except tk.TclError:
+            pass  # Keep the last valid settings while a scale is mid-edit
+        
+    def _refresh_transform(self, *args):
+        """Snapshot rotation and zoom for the capture thread."""
+        try:
+            self._angle = self.rotation.get()
+            self._zoom = self.zoom.get()
+            self._affine = None
+        except tk.TclError:
+            pass  # Keep the last valid values while a scale is mid-edit
         
     def update_camera_settings(self):
         """Update camera settings."""
@@ -11,6 +11,8 @@ from microscope.hardware.gcode import GCode  # Import the GCode class
 from microscope.config import FILE_SETTINGS
 from microscope.utils.experiment import Experiment
 
+_ELAPSED_FORMAT = "Elapsed: %02d:%02d:%02d"
+
 class ExperimentGUI:
     def __init__(self, root: tk.Tk, checkbox_var: tk.BooleanVar, camera: Camera, gcode: GCode):
         self.logger = logging.getLogger(__name__)
@@ -35,7 +37,12 @@ class ExperimentGUI:
             'minutes': tk.StringVar(value="0"),
             'seconds': tk.StringVar(value="0")
         }
+        # Parsed once per edit; None while an entry isn't a whole number
+        self._total_seconds: Optional[int] = 0
+        for var in self.duration.values():
+            var.trace_add('write', self._reparse_duration)
         self.status_var = tk.StringVar(value="Ready")
+        self._last_shown_sec: Optional[int] = None  # Elapsed second currently in time_var
         self.save_folder = "images"  # Default save folder
         self.folder_path = tk.StringVar(value=self.save_folder)
         self.prefix_var = tk.StringVar(value="")
@@ -184,11 +191,9 @@ class ExperimentGUI:
                 raise ValueError("Please enter a file prefix")
             
             # Check duration
-            hours = int(self.duration['hours'].get())
-            minutes = int(self.duration['minutes'].get())
-            seconds = int(self.duration['seconds'].get())
-            
-            if hours == 0 and minutes == 0 and seconds == 0:
+            if self._total_seconds is None:
+                raise ValueError("Duration must be whole numbers")
+            if self._total_seconds == 0:
                 raise ValueError("Please set a duration greater than 0")
             
             # Check pause time
@@ -235,6 +240,7 @@ class ExperimentGUI:
             self.pause_button.config(state=tk.NORMAL)
             self.stop_button.config(state=tk.NORMAL)
             self.status_var.set("Experiment running...")
+            self._last_shown_sec = None
             self.update_time()
         except Exception as e:
             self.logger.error(f"Error starting experiment: {e}")
@@ -261,11 +267,13 @@ class ExperimentGUI:
         if self.is_running and self.experiment.is_running:
             elapsed_time = self.experiment.get_elapsed_time()
             if elapsed_time is not None:
-                hours = int(elapsed_time // 3600)
-                minutes = int((elapsed_time % 3600) // 60)
-                seconds = int(elapsed_time % 60)
-                
-                self.time_var.set(f"Elapsed: {hours:02d}:{minutes:02d}:{seconds:02d}")
+                total = int(elapsed_time)
+                # after(1000) drifts, so a tick can land in the second already shown
+                if total != self._last_shown_sec:
+                    self._last_shown_sec = total
+                    minutes, seconds = divmod(total, 60)
+                    hours, minutes = divmod(minutes, 60)
+                    self.time_var.set(_ELAPSED_FORMAT % (hours, minutes, seconds))
                 
                 self.window.after(1000, self.update_time)
             
@@ -285,10 +293,17 @@ class ExperimentGUI:
             return json.load(f)
 
     def get_total_duration(self) -> float:
-        hours = int(self.duration['hours'].get())
-        minutes = int(self.duration['minutes'].get())
-        seconds = int(self.duration['seconds'].get())
-        return hours * 3600 + minutes * 60 + seconds
+        return self._total_seconds
+
+    def _reparse_duration(self, *args):
+        try:
+            hours = int(self.duration['hours'].get())
+            minutes = int(self.duration['minutes'].get())
+            seconds = int(self.duration['seconds'].get())
+        except ValueError:
+            self._total_seconds = None
+            return
+        self._total_seconds = hours * 3600 + minutes * 60 + seconds
 
     def start(self):
         if self.window is None:
@@ -1,3 +1,5 @@
+import threading
+
 from picamera2 import Picamera2
 
 class Camera:
@@ -5,12 +7,33 @@ class Camera:
         self.picam2 = Picamera2()
         self.picam2_config = self.picam2.create_preview_configuration(main={"size": (640, 480)})
         self.picam2.configure(self.picam2_config)
+        self._latest = None  # Newest frame delivered by the camera thread, not yet taken
+        self._frame_cond = threading.Condition()
+        self.picam2.post_callback = self._on_request
         self.picam2.start()
 
+    def _on_request(self, request):
+        # Runs on the camera thread for every completed request; an untaken frame is simply replaced
+        frame = request.make_array("main")
+        with self._frame_cond:
+            self._latest = frame
+            self._frame_cond.notify()
+
     def capture_frame(self):
         frame = self.picam2.capture_array("main")
         return frame
 
+    def capture_latest(self, timeout=1.0):
+        """Return the newest frame not yet taken, waiting for one if needed; None on timeout.
+
+        Frames that arrived while the caller was busy are skipped rather than queued.
+        """
+        with self._frame_cond:
+            if self._latest is None:
+                self._frame_cond.wait(timeout)
+            frame, self._latest = self._latest, None
+        return frame
+
     def stop(self):
         self.picam2.stop()
 